@@ -0,0 +1,229 @@
+# src/batch_export.py
+# Plans for a whole member list, outside the Flet UI:
+#   python -m src.batch_export members.csv plans.csv --workers 4
+#   python -m src.batch_export members.jsonl plans.jsonl --resume
+#   python -m src.batch_export members.csv plans.parquet      (needs pyarrow)
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from concurrent.futures import FIRST_COMPLETED, wait
+from src import metrics
+from src.diet_logic import MEALS, get_planner, planner_pool
+
+# ---------------- SETTINGS ---------------- #
+
+CHUNK_SIZE = 500        # profiles per task and per write
+IN_FLIGHT = 2           # chunks queued per worker, bounds memory
+
+SUMMARY_COLUMNS = ["id", "target_calories", "total_calories", "total_prot", "total_carb",
+                   "total_fat", "bmi", "bmi_status", "body_fat", "constraints_met"]
+MEAL_FIELDS = ["food", "portion_g", "total_kcal"]
+COLUMNS = SUMMARY_COLUMNS + [f"{m}_{f}" for m in MEALS for f in MEAL_FIELDS] + ["error"]
+INT_COLUMNS = ["target_calories", "total_calories"] + [f"{m}_{f}" for m in MEALS for f in ["portion_g", "total_kcal"]]
+
+# ---------------- INPUT ---------------- #
+
+def read_profiles(path, chunk_size=CHUNK_SIZE):
+    # yields DataFrames of at most chunk_size rows, never the whole file
+    if path.endswith(".jsonl") or path.endswith(".ndjson"):
+        chunks = pd.read_json(path, lines=True, chunksize=chunk_size)
+    else:
+        # "None" is a real allergy value, only empty cells are missing
+        chunks = pd.read_csv(path, chunksize=chunk_size, keep_default_na=False, na_values=[""])
+    start = 0
+    for chunk in chunks:
+        if "id" not in chunk:
+            chunk.insert(0, "id", range(start, start + len(chunk)))
+        start += len(chunk)
+        yield chunk
+
+# ---------------- WORKER ---------------- #
+
+def flat_row(pid, plan):
+    row = {col: plan.get(col) for col in SUMMARY_COLUMNS[1:]}
+    row["id"] = pid
+    for meal in MEALS:
+        for field in MEAL_FIELDS:
+            row[f"{meal}_{field}"] = plan["meals"][meal][field]
+    return row
+
+def plan_chunk(index, records):
+    planner = get_planner()
+    # empty cells arrive as NaN, the planner expects None
+    records = [{k: (None if isinstance(v, float) and np.isnan(v) else v) for k, v in r.items()}
+               for r in records]
+
+    # one bad profile should not lose the rest of the chunk
+    body = planner.body_metrics(pd.DataFrame.from_records(records))
+    bad = set(np.flatnonzero(body["calories"].isna().to_numpy()).tolist())
+    good = [r for i, r in enumerate(records) if i not in bad]
+    # seeded per chunk so a resumed run writes the same plans
+    plans = iter(planner.plan_batch(good, seed=index))
+
+    out = []
+    for i, r in enumerate(records):
+        plan = {"error": "invalid age/weight/height"} if i in bad else next(plans)
+        out.append(dict(plan, id=r["id"]))
+    return index, out
+
+# ---------------- OUTPUT ---------------- #
+
+def _clean(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+class PlanWriter:
+    # appends chunks in input order; CSV and JSONL go to one file, Parquet to
+    # one part file per chunk in a directory (a Parquet file cannot be
+    # reopened for appending, parts can). Returns the output size after each
+    # write so a resumed run can cut off a half-written chunk.
+
+    def __init__(self, path):
+        self.path = path
+        self.fmt = os.path.splitext(path)[1].lstrip(".").lower()
+        if self.fmt == "ndjson":
+            self.fmt = "jsonl"
+        if self.fmt not in ("csv", "jsonl", "parquet"):
+            raise ValueError(f"unsupported output format: {path}")
+        if self.fmt == "parquet":
+            try:
+                import pyarrow      # noqa: F401  optional, only needed for .parquet
+            except ImportError:
+                raise ImportError("Parquet output needs pyarrow: pip install pyarrow") from None
+            os.makedirs(path, exist_ok=True)
+
+    def truncate(self, size):
+        if self.fmt != "parquet" and os.path.exists(self.path):
+            with open(self.path, "r+b") as f:
+                f.truncate(size)
+
+    def write(self, index, plans):
+        if self.fmt == "jsonl":
+            with open(self.path, "a", encoding="utf-8") as f:
+                for plan in plans:
+                    f.write(json.dumps(plan, default=_clean) + "\n")
+            return os.path.getsize(self.path)
+
+        rows = [flat_row(p["id"], p) if "meals" in p else {"id": p["id"], "error": p["error"]}
+                for p in plans]
+        frame = pd.DataFrame(rows, columns=COLUMNS)
+        # nullable ints keep these integer next to error rows
+        frame = frame.astype({col: "Int64" for col in INT_COLUMNS})
+        if self.fmt == "csv":
+            header = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+            frame.to_csv(self.path, mode="a", header=header, index=False)
+            return os.path.getsize(self.path)
+
+        frame.to_parquet(os.path.join(self.path, f"part-{index:06d}.parquet"), index=False)
+        return 0
+
+# ---------------- CHECKPOINT ---------------- #
+
+def _checkpoint_file(output):
+    return output.rstrip("/") + ".progress.json"
+
+def load_checkpoint(output):
+    try:
+        with open(_checkpoint_file(output), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save_checkpoint(output, state):
+    path = _checkpoint_file(output)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+# ---------------- EXPORT ---------------- #
+
+def export(input_path, output_path, workers=None, chunk_size=CHUNK_SIZE, resume=False, progress=True):
+    workers = workers or os.cpu_count() or 1
+
+    state = load_checkpoint(output_path) if resume else None
+    if state and (state["input"] != os.path.abspath(input_path) or state["chunk_size"] != chunk_size):
+        raise ValueError("checkpoint was written for a different input or chunk size")
+    if state is None:
+        state = {"input": os.path.abspath(input_path), "chunk_size": chunk_size,
+                 "chunks": 0, "rows": 0, "bytes": 0}
+        if os.path.isfile(output_path):
+            os.remove(output_path)
+        elif os.path.isdir(output_path):
+            for name in os.listdir(output_path):
+                if name.startswith("part-"):
+                    os.remove(os.path.join(output_path, name))
+
+    writer = PlanWriter(output_path)
+    writer.truncate(state["bytes"])
+    skip = state["chunks"]
+
+    start = time.perf_counter()
+    done_rows = 0
+    pending, results = set(), {}
+    next_write = skip
+
+    def flush():
+        nonlocal next_write, done_rows
+        while next_write in results:
+            plans = results.pop(next_write)
+            with metrics.timer("export.write"):
+                state["bytes"] = writer.write(next_write, plans)
+            next_write += 1
+            done_rows += len(plans)
+            state["chunks"] = next_write
+            state["rows"] += len(plans)
+            save_checkpoint(output_path, state)
+            metrics.incr("export.rows", len(plans))
+            if progress:
+                rate = done_rows / max(time.perf_counter() - start, 1e-9)
+                print(f"\r📦 {state['rows']} plans | {next_write} chunks | {rate:,.0f} plans/s",
+                      end="", file=sys.stderr, flush=True)
+
+    with planner_pool(workers) as pool:
+        for index, chunk in enumerate(read_profiles(input_path, chunk_size)):
+            if index < skip:
+                continue
+            pending.add(pool.submit(plan_chunk, index, chunk.to_dict("records")))
+            # chunks finished out of order wait in `results` for a slow one,
+            # so they count against the limit too
+            while pending and len(pending) + len(results) >= workers * IN_FLIGHT:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    i, plans = fut.result()
+                    results[i] = plans
+                flush()
+
+        for fut in pending:
+            i, plans = fut.result()
+            results[i] = plans
+        flush()
+
+    if progress:
+        print(file=sys.stderr)
+    state["done"] = True
+    save_checkpoint(output_path, state)
+    return state
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export diet plans for a list of profiles")
+    parser.add_argument("input", help="CSV or JSONL with age, gender, weight, height, activity, "
+                                      "goal, preference, allergy (id, neck, waist optional)")
+    parser.add_argument("output", help=".csv, .jsonl or .parquet (a directory of parts)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--resume", action="store_true", help="continue an interrupted export")
+    parser.add_argument("--quiet", action="store_true")
+    args = parser.parse_args(argv)
+
+    state = export(args.input, args.output, args.workers, args.chunk_size, args.resume, not args.quiet)
+    print(f"✅ {state['rows']} plans written to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
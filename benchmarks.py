@@ -0,0 +1,625 @@
+# src/benchmarks.py
+# Run with:
+#   python -m src.benchmarks                  regression suite vs. bench_baseline.json
+#                                             (exits 1 on a regression, 2 without a baseline)
+#   python -m src.benchmarks --save-baseline  record a new baseline
+#   python -m src.benchmarks --compare        old-vs-new comparisons
+#   python -m src.benchmarks --imports src.main_app   slowest imports of a module
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+import threading
+import tracemalloc
+import itertools
+import numpy as np
+import pandas as pd
+from src.diet_logic import SimpleINDBDiet, InfeasiblePlanError
+from src.plan_cache import PlanCache
+from src.memory_store import JsonMemoryStore, SqliteMemoryStore, open_memory_store
+from src.lookup_cache import LookupCache
+from src.intent_router import detect_intent, ProgrammingAnswers
+from src.chat_view import ChatTranscript
+from src.knowledge_base import KnowledgeBase
+
+PREFERENCES = ["Veg", "Egg", "Non-Veg", "Veg+Egg", "Egg+Non-Veg", "Veg+Egg+Non-Veg"]
+GOALS = ["Weight loss", "Weight Gain", "Maintenance"]
+ALLERGIES = ["None", "Egg", "Gluten", "Milk"]
+ACTIVITIES = [
+    "Sedentary(No activity)",
+    "Light(Walk)",
+    "Moderate(Walk+Light Excersises)",
+    "Active(Light workout GYM)",
+    "Very active(Workout GYM + Sports)"
+]
+
+# ---------------- HELPERS ---------------- #
+
+def sample_profiles(n, seed=0):
+    rng = np.random.default_rng(seed)
+    profiles = []
+    for _ in range(n):
+        weight = round(float(rng.uniform(45, 110)), 1)
+        height = round(float(rng.uniform(150, 195)), 1)
+        profiles.append({
+            "age": int(rng.integers(18, 70)),
+            "gender": str(rng.choice(["m", "f"])),
+            "weight": weight,
+            "height": height,
+            "neck": round(float(rng.uniform(30, 45)), 1),
+            "waist": round(float(rng.uniform(65, 110)), 1),
+            "activity": str(rng.choice(ACTIVITIES)),
+            "goal": str(rng.choice(GOALS)),
+            "preference": str(rng.choice(PREFERENCES)),
+            "allergy": str(rng.choice(ALLERGIES)),
+        })
+    return profiles
+
+def plan_one(planner, p, **kwargs):
+    bmi = planner.calculate_bmi(p["weight"], p["height"])
+    return planner.plan(
+        p["age"], p["gender"], p["weight"], p["height"], bmi, None,
+        p["neck"], p["waist"], p["activity"], p["goal"], p["preference"], p["allergy"],
+        **kwargs
+    )
+
+def percentiles(samples_s):
+    ms = np.asarray(samples_s) * 1000
+    return {"p50_ms": float(np.percentile(ms, 50)), "p99_ms": float(np.percentile(ms, 99))}
+
+def legacy_detect_intent(msg):
+    # chatbot.detect_intent before the compiled router, kept for comparison
+    if re.search(r"\b(hi|hello|hey)\b", msg):
+        return "SMALL_TALK"
+    if any(k in msg for k in ["sin", "cos", "area", "derivative", "+", "-", "*", "/", "^"]):
+        return "MATH"
+    if any(k in msg for k in ["python", "java", "c++", "programming"]):
+        return "TECH"
+    if any(k in msg for k in ["my name", "my age", "my birth"]):
+        return "PERSONAL"
+    return "FACT"
+
+def sample_messages(n, seed=0):
+    rng = np.random.default_rng(seed)
+    templates = [
+        "what is {food}", "how much protein in {food}", "is {food} gluten-free",
+        "calories in {food} per 100g", "tell me about {food} and/or {food}",
+        "veg/non-veg options with {food}", "hello", "hey what's up", "what is {a} + {b}",
+        "{a} * {b}", "derivative of x^{a}", "area of circle radius {a}", "explain python decorators",
+        "java vs c++", "my name is ravi", "what is my age", "who is the health minister",
+        "using {food} in a low-fat diet", "best post-workout {food}"
+    ]
+    foods = ["paneer tikka", "dal makhani", "roti", "idli sambhar", "egg bhurji", "fish fry", "dosa"]
+    msgs = []
+    for t in rng.choice(templates, size=n):
+        msgs.append(str(t).format(food=rng.choice(foods), a=rng.integers(1, 99), b=rng.integers(1, 99)))
+    return msgs
+
+# ---------------- BENCHMARKS ---------------- #
+
+def bench_plan_batch(planner, n=200):
+    profiles = sample_profiles(n)
+
+    start = time.perf_counter()
+    for p in profiles:
+        plan_one(planner, p)
+    loop_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    planner.plan_batch(profiles)
+    batch_s = time.perf_counter() - start
+
+    print(f"plan() loop   : {n} plans in {loop_s:.3f}s  ({n / loop_s:,.0f} plans/s)")
+    print(f"plan_batch()  : {n} plans in {batch_s:.3f}s  ({n / batch_s:,.0f} plans/s)")
+    print(f"speedup       : {loop_s / batch_s:.1f}x")
+    return {"loop_s": loop_s, "batch_s": batch_s}
+
+def bench_solver(planner, n=300):
+    profiles = sample_profiles(n, seed=1)
+    results = {}
+
+    for solver in ["sample", "exact"]:
+        times, hits = [], 0
+        for i, p in enumerate(profiles):
+            start = time.perf_counter()
+            try:
+                hits += plan_one(planner, p, solver=solver, seed=i)["constraints_met"]
+            except InfeasiblePlanError:
+                pass
+            times.append(time.perf_counter() - start)
+
+        stats = percentiles(times)
+        stats["hit_rate"] = hits / n
+        results[solver] = stats
+        print(f"{solver:<7}: p50 {stats['p50_ms']:.2f} ms | p99 {stats['p99_ms']:.2f} ms | "
+              f"constraints met {stats['hit_rate']:.1%}")
+    return results
+
+def bench_plan_week(planner, n=100):
+    # a week as 7 independent plan() calls vs. one plan_week() pass
+    profiles = sample_profiles(n, seed=6)
+    results = {}
+    for label in ["7x plan", "plan_week"]:
+        times, repeats = [], []
+        for p in profiles:
+            start = time.perf_counter()
+            if label == "plan_week":
+                bmi = planner.calculate_bmi(p["weight"], p["height"])
+                week = planner.plan_week(
+                    p["age"], p["gender"], p["weight"], p["height"], bmi, None,
+                    p["neck"], p["waist"], p["activity"], p["goal"], p["preference"], p["allergy"]
+                )
+                days = week["days"]
+            else:
+                days = [plan_one(planner, p) for _ in range(7)]
+            times.append(time.perf_counter() - start)
+            foods = [m["food"] for d in days for m in d["meals"].values()]
+            repeats.append(len(foods) - len(set(foods)))
+
+        stats = percentiles(times)
+        stats["repeated_foods"] = float(np.mean(repeats))
+        results[label] = stats
+        print(f"{label:<9}: p50 {stats['p50_ms']:.2f} ms | p99 {stats['p99_ms']:.2f} ms | "
+              f"repeated foods/week {stats['repeated_foods']:.1f}")
+    return results
+
+def bench_plan_memory(planner, n=2_000):
+    # bytes per plan held in memory: nested dicts vs. CompactPlan vs. PlanBatch
+    profiles = sample_profiles(n, seed=8)
+    results = {}
+    for label in ["dict", "CompactPlan", "PlanBatch"]:
+        tracemalloc.start()
+        start = time.perf_counter()
+        if label == "PlanBatch":
+            held = planner.plan_batch(profiles, seed=0, compact=True)
+        else:
+            held = [plan_one(planner, p, seed=i, compact=label == "CompactPlan")
+                    for i, p in enumerate(profiles)]
+        elapsed = time.perf_counter() - start
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[label] = {"bytes_per_plan": current / n, "ms_per_plan": elapsed * 1000 / n}
+        print(f"{label:<11}: {current / n:,.0f} B/plan | {elapsed * 1000 / n:.3f} ms/plan")
+        del held
+    return results
+
+def bench_startup(repeat=5):
+    # cold start of SimpleINDBDiet: in-memory build vs. memory-mapped store
+    with tempfile.TemporaryDirectory() as tmp:
+        store_dir = f"{tmp}/food_store"
+        SimpleINDBDiet(store_dir=store_dir)   # builds the store once
+
+        results = {}
+        for label, kwargs in [("build", {"store_dir": None}), ("mmap", {"store_dir": store_dir})]:
+            times = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                SimpleINDBDiet(**kwargs)
+                times.append(time.perf_counter() - start)
+            results[label] = percentiles(times)
+            print(f"startup {label:<5}: p50 {results[label]['p50_ms']:.2f} ms")
+    return results
+
+def bench_memory_store(writers=(1, 4, 16), messages=200):
+    # messages/sec with N threads writing chat turns for their own user
+    results = {}
+    for name, make in [("json", lambda d: JsonMemoryStore(os.path.join(d, "memory.json"))),
+                       ("sqlite", lambda d: SqliteMemoryStore(os.path.join(d, "memory.sqlite3")))]:
+        for n in writers:
+            with tempfile.TemporaryDirectory() as tmp:
+                store = make(tmp)
+
+                def write(user):
+                    for i in range(messages):
+                        store.add_chat(user, f"question {i}", f"answer {i}")
+
+                threads = [threading.Thread(target=write, args=(f"user{w}",)) for w in range(n)]
+                start = time.perf_counter()
+                for t in threads:
+                    t.start()
+                for t in threads:
+                    t.join()
+                elapsed = time.perf_counter() - start
+
+            rate = n * messages / elapsed
+            results[f"{name}_{n}"] = rate
+            print(f"memory {name:<6} x{n:<3}: {rate:,.0f} msgs/s")
+    return results
+
+def bench_intent_router(n=100_000):
+    msgs = sample_messages(n)
+    results = {}
+    for name, detect in [("legacy", legacy_detect_intent), ("router", detect_intent)]:
+        start = time.perf_counter()
+        intents = [detect(m) for m in msgs]
+        elapsed = time.perf_counter() - start
+        math_share = intents.count("MATH") / n
+        results[name] = {"us_per_msg": elapsed / n * 1e6, "math_share": math_share}
+        print(f"intent {name:<6}: {elapsed / n * 1e6:.2f} us/msg | routed to MATH {math_share:.1%}")
+    return results
+
+def bench_programming_lookup(n=10_000, keys=300):
+    # old get_programming_answer (reload + linear scan per message) vs. the
+    # compiled, reload-on-change ProgrammingAnswers
+    msgs = sample_messages(n)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "programming.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({f"topic{i} python": f"answer {i}" for i in range(keys)} | {"python": "py"}, f)
+
+        def legacy(msg):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            for key, value in data.items():
+                if key in msg:
+                    return value
+            return None
+
+        answers = ProgrammingAnswers(path)
+        results = {}
+        for name, lookup in [("legacy", legacy), ("router", answers.lookup)]:
+            start = time.perf_counter()
+            for m in msgs:
+                lookup(m)
+            elapsed = time.perf_counter() - start
+            results[name] = elapsed / n * 1e6
+            print(f"programming {name:<6}: {results[name]:.2f} us/msg")
+    return results
+
+class TreeNode:
+    # stand-in for a Flet control tree without a running page: update()
+    # walks the subtree the way Flet diffs it before sending changes, which
+    # is the part of an update that grows with the conversation
+    def __init__(self, text=""):
+        self.controls = []
+        self.value = text
+        self.visible = True
+        self.data = None
+
+    def update(self):
+        stack, walked = [self], 0
+        while stack:
+            node = stack.pop()
+            walked += 1
+            stack.extend(node.controls)
+        return walked
+
+def chat_transcripts(size):
+    # (label, add-one-message) for the old Column + page.update() and the
+    # windowed transcript, both already holding `size` messages
+    page, column = TreeNode(), TreeNode()
+    page.controls.append(column)
+
+    def legacy_add(text):
+        column.controls.append(TreeNode(text))
+        page.update()
+
+    def make(text, mine):
+        node = TreeNode(text)
+        node.data = (text, mine)
+        return node
+
+    view = TreeNode()
+    transcript = ChatTranscript(view, make, lambda node: node.data, TreeNode(), TreeNode())
+
+    for i in range(size):
+        column.controls.append(TreeNode(f"message {i}"))
+        transcript.add(f"message {i}", mine=i % 2 == 0)
+    return [("column", legacy_add, column), ("window", transcript.add, view)]
+
+def bench_chat_view(sizes=(1_000, 10_000), n=200):
+    results = {}
+    for size in sizes:
+        for label, add, holder in chat_transcripts(size):
+            times = []
+            for i in range(n):
+                start = time.perf_counter()
+                add(f"new message {i}")
+                times.append(time.perf_counter() - start)
+            stats = percentiles(times)
+            stats["controls"] = len(holder.controls)
+            results[f"{label}.{size}"] = stats
+            print(f"chat {label:<6} @ {size:>6}: p50 {stats['p50_ms']:.3f} ms | "
+                  f"p99 {stats['p99_ms']:.3f} ms | {stats['controls']} controls")
+    return results
+
+# ---------------- REGRESSION SUITE ---------------- #
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+TOLERANCE = 0.25        # allowed slowdown / growth of peak memory
+# the fastest run is what gates: it is far less sensitive to a busy machine
+# than the median, the rest of the distribution is kept for reading
+
+def measure(fn, repeat=20, warmup=2):
+    # latency distribution over `repeat` calls plus the peak traced memory of one call
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    ms = np.asarray(times) * 1000
+    return {
+        "min_ms": round(float(ms.min()), 4),
+        "p50_ms": round(float(np.percentile(ms, 50)), 4),
+        "p90_ms": round(float(np.percentile(ms, 90)), 4),
+        "p99_ms": round(float(np.percentile(ms, 99)), 4),
+        "mean_ms": round(float(ms.mean()), 4),
+        "peak_kb": round(peak / 1024, 1)
+    }
+
+def calibrate():
+    # fixed CPU workload timed with every run; comparisons are scaled by it so
+    # a slower or busier machine does not read as a regression
+    data = np.random.default_rng(0).random(200_000)
+
+    def work():
+        total = 0
+        for i in range(100_000):
+            total += i * i
+        np.sort(data)
+
+    return measure(work, repeat=9, warmup=1)
+
+def gated(name):
+    # per-combination plan timings are recorded but only the aggregates gate
+    return name.count(".") < 3
+
+# modules whose import cost is tracked; the app's first paint only needs the
+# last one, which must stay free of pandas and the chatbot
+IMPORT_MODULES = ["src.metrics", "src.plan_cache", "src.diet_logic", "src.chatbot", "src.main_app"]
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def import_profile(module):
+    # cumulative import time (ms) of every module loaded by `import module`
+    # in a fresh interpreter, from python -X importtime. It runs in a temp
+    # dir: importing the chatbot creates its src/data files, and those must
+    # not land in the user's
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+    with tempfile.TemporaryDirectory() as tmp:
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                              cwd=tmp, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise ImportError(proc.stderr.strip().splitlines()[-1])
+    times = {}
+    for line in proc.stderr.splitlines():
+        parts = line.removeprefix("import time:").split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        times[parts[2].strip()] = int(parts[1]) / 1000
+    return times
+
+def suite_imports(results, repeat=5):
+    for module in IMPORT_MODULES:
+        try:
+            runs = [import_profile(module)[module] for _ in range(repeat)]
+        except ImportError as ex:
+            print(f"skipping import of {module}: {ex}")
+            continue
+        results[f"import.{module}"] = {"min_ms": round(min(runs), 3),
+                                       "p50_ms": round(float(np.median(runs)), 3)}
+
+def import_report(module, top=15):
+    times = import_profile(module)
+    for name, ms in sorted(times.items(), key=lambda kv: -kv[1])[:top]:
+        print(f"{ms:9.1f} ms  {name}")
+
+def suite_startup(results):
+    with tempfile.TemporaryDirectory() as tmp:
+        store_dir = os.path.join(tmp, "food_store")
+        SimpleINDBDiet(store_dir=store_dir)
+        results["startup.build"] = measure(lambda: SimpleINDBDiet(store_dir=None), repeat=5, warmup=1)
+        results["startup.mmap"] = measure(lambda: SimpleINDBDiet(store_dir=store_dir), repeat=10)
+
+def suite_plan(results, planner):
+    # every preference x goal x allergen combination, for both solvers
+    profile = sample_profiles(1)[0]
+    for solver in ["sample", "exact"]:
+        times = []
+        for pref, goal, allergy in itertools.product(PREFERENCES, GOALS, ALLERGIES):
+            p = dict(profile, preference=pref, goal=goal, allergy=allergy)
+
+            def run():
+                try:
+                    plan_one(planner, p, solver=solver, seed=0)
+                except InfeasiblePlanError:
+                    pass
+
+            stats = measure(run, repeat=5, warmup=1)
+            results[f"plan.{solver}.{pref}.{goal}.{allergy}"] = stats
+            times.append(stats["min_ms"])
+        # median / worst combination of the per-combination best times
+        results[f"plan.{solver}.all"] = {"min_ms": round(float(np.median(times)), 4),
+                                         "p99_ms": round(float(np.percentile(times, 99)), 4)}
+
+    week = dict(profile, preference="Veg", goal="Weight loss", allergy="None")
+    bmi = planner.calculate_bmi(week["weight"], week["height"])
+    results["plan_week"] = measure(lambda: planner.plan_week(
+        week["age"], week["gender"], week["weight"], week["height"], bmi, None, week["neck"],
+        week["waist"], week["activity"], week["goal"], week["preference"], week["allergy"], seed=0
+    ), repeat=10)
+
+    cache = PlanCache()
+    results["plan_cache.hit"] = measure(lambda: cache.plan(
+        planner, week["age"], week["gender"], week["weight"], week["height"], bmi, None, week["neck"],
+        week["waist"], week["activity"], week["goal"], week["preference"], week["allergy"], seed=0
+    ), repeat=50)
+
+    results["substitutes"] = measure(lambda: planner.substitutes("Paneer Tikka", k=5, lower=("fat",)),
+                                     repeat=50)
+
+    profiles = sample_profiles(500, seed=2)
+    results["plan_batch.500"] = measure(lambda: planner.plan_batch(profiles, seed=0), repeat=5, warmup=1)
+    results["plan_batch.500.compact"] = measure(lambda: planner.plan_batch(profiles, seed=0, compact=True),
+                                                repeat=5, warmup=1)
+
+def suite_body_metrics(results, planner, n=10_000):
+    people = sample_profiles(n, seed=3)
+
+    def bmi():
+        for p in people:
+            planner.calculate_bmi(p["weight"], p["height"])
+
+    def body_fat():
+        for p in people:
+            try:
+                planner.navy_body_fat(p["gender"], p["height"], p["neck"], p["waist"])
+            except ValueError:
+                pass
+
+    def bmr():
+        for p in people:
+            planner.bmr(p["age"], p["gender"], p["weight"], p["height"], p["activity"], p["goal"])
+
+    for name, fn in [("bmi", bmi), ("navy_body_fat", body_fat), ("bmr", bmr)]:
+        results[f"metrics.{name}.{n}"] = measure(fn, repeat=5, warmup=1)
+
+    # all three at once through the vectorized API
+    frame = pd.DataFrame(people)
+    results[f"metrics.bulk.{n}"] = measure(lambda: planner.body_metrics(frame), repeat=5, warmup=1)
+
+def suite_knowledge(results, planner):
+    kb = KnowledgeBase(planner=lambda: planner)
+    results["knowledge.build"] = measure(lambda: kb._build(planner), repeat=5, warmup=1)
+    queries = itertools.cycle(["calories in paneer tikka", "boiled egg", "protein in dal makhani",
+                               "rice", "who is elon musk", "python decorators"])
+    results["knowledge.search"] = measure(lambda: kb.search(next(queries)), repeat=120)
+
+def suite_chatbot(results, n=200):
+    try:
+        from src import chatbot
+    except ImportError as ex:
+        print(f"skipping chatbot suite: {ex}")
+        return
+
+    # network stubbed out, answers come back immediately; memory and lookup
+    # cache point at a temp dir so the user's src/data is never touched
+    saved = {name: getattr(chatbot, name) for name in
+             ["fetch_wikipedia", "fetch_duckduckgo", "memory", "lookup_cache", "recall_indexes"]}
+    with tempfile.TemporaryDirectory() as tmp:
+        chatbot.fetch_wikipedia = lambda query, cancel=None: f"stub article about {query}"
+        chatbot.fetch_duckduckgo = lambda query, cancel=None: None
+        chatbot.memory = open_memory_store(tmp)
+        chatbot.lookup_cache = LookupCache(os.path.join(tmp, "lookup_cache.sqlite3"))
+        chatbot.recall_indexes = {}
+        try:
+            msgs = sample_messages(n, seed=4)
+            counter = itertools.count()
+
+            def fresh():
+                # unique suffix so the lookup cache and recall do not short-circuit
+                chatbot.get_smart_response(f"{msgs[next(counter) % n]} {next(counter)}")
+
+            def repeat():
+                chatbot.get_smart_response(msgs[next(counter) % 20])
+
+            results["chat.fresh"] = measure(fresh, repeat=n)
+            results["chat.repeat"] = measure(repeat, repeat=n)
+        finally:
+            for name, value in saved.items():
+                setattr(chatbot, name, value)
+
+def suite_chat_view(results, size=10_000):
+    _, add, _ = chat_transcripts(size)[1]
+    counter = itertools.count()
+    results[f"chat_view.add.{size}"] = measure(lambda: add(f"message {next(counter)}"), repeat=200)
+
+def run_suite():
+    results = {"calibration": calibrate()}
+    suite_imports(results)
+    suite_startup(results)
+    planner = SimpleINDBDiet(store_dir=None)
+    suite_plan(results, planner)
+    suite_body_metrics(results, planner)
+    suite_knowledge(results, planner)
+    suite_chatbot(results)
+    suite_chat_view(results)
+    return results
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    regressions = []
+    speed = 1.0
+    if "calibration" in baseline and "calibration" in results:
+        speed = results["calibration"]["min_ms"] / baseline["calibration"]["min_ms"]
+
+    for name, stats in sorted(results.items()):
+        base = baseline.get(name)
+        if not base or name == "calibration" or not gated(name):
+            continue
+        for key in ["min_ms", "peak_kb"]:
+            if key in stats and base.get(key):
+                expected = base[key] * (speed if key == "min_ms" else 1.0)
+                ratio = stats[key] / expected
+                if ratio > 1 + tolerance:
+                    regressions.append(f"{name} {key}: {expected:.4f} -> {stats[key]} ({ratio:.2f}x)")
+    return regressions
+
+def run_compare():
+    bench_startup()
+    planner = SimpleINDBDiet()
+    bench_plan_batch(planner)
+    bench_solver(planner)
+    bench_plan_week(planner)
+    bench_plan_memory(planner)
+    bench_memory_store()
+    bench_intent_router()
+    bench_programming_lookup()
+    bench_chat_view()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Diet Pro benchmarks")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--output", help="write this run's results as JSON")
+    parser.add_argument("--compare", action="store_true", help="run the old-vs-new comparisons instead")
+    parser.add_argument("--imports", metavar="MODULE", help="print the slowest imports of MODULE")
+    args = parser.parse_args(argv)
+
+    if args.imports:
+        import_report(args.imports)
+        return 0
+
+    if args.compare:
+        run_compare()
+        return 0
+
+    results = run_suite()
+    for name in sorted(results):
+        if gated(name):
+            print(f"{name:<32} {results[name]}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        # a gate without a baseline would pass whatever happened
+        print(f"no baseline at {args.baseline}, run with --save-baseline first")
+        return 2
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        regressions = compare(results, json.load(f), args.tolerance)
+    for r in regressions:
+        print("REGRESSION", r)
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+# src/chat_view.py
+from src import metrics
+
+# ---------------- SETTINGS ---------------- #
+
+WINDOW = 200            # messages kept as controls in the list
+PAGE_SIZE = 25          # Q&As brought back per "earlier messages" click
+
+# ---------------- TRANSCRIPT ---------------- #
+
+class ChatTranscript:
+    # Virtualized chat transcript. The list view holds at most `window`
+    # message controls; older ones are dropped from it (only their text is
+    # kept) and come back a page at a time, then from the memory store for
+    # earlier sessions. Paging back drops the newest messages the same way,
+    # and they come back through `later`. Every change updates the list view
+    # alone, never the whole page, so the cost of a message does not grow
+    # with the chat.
+    #
+    # The UI toolkit stays in main_app: make_message(text, mine) builds a
+    # control, read_message(control) returns its (text, mine), `more` is the
+    # "earlier messages" control kept at the top of the list and `later` the
+    # "later messages" control shown below it.
+
+    def __init__(self, view, make_message, read_message, more, later, window=WINDOW, page_size=PAGE_SIZE):
+        self.view = view
+        self.make_message = make_message
+        self.read_message = read_message
+        self.more = more
+        self.later = later
+        self.window = window
+        self.page_size = page_size
+
+        self._hidden = []           # (text, mine) dropped from the top, oldest first
+        self._newer = []            # controls dropped from the bottom, oldest first; kept
+                                    # whole as the newest one may still be streaming
+        self._history = None        # history_page(before, limit) of the memory store
+        self._cursor = None         # next older page of the store, None when done
+        self.view.controls[:] = [more]
+        self.later.visible = False
+
+    def __len__(self):
+        return len(self.view.controls) - 1
+
+    def start_history(self, history_page, end):
+        # called once the chatbot is loaded and before this session's first
+        # message is stored, so paging back starts with earlier sessions
+        if self._history is None:
+            self._history = history_page
+            self._cursor = end
+
+    def add(self, text, mine=False):
+        if self._newer:
+            # a new message brings the view back to the latest ones
+            self._take_newer(len(self._newer))
+        control = self.make_message(text, mine)
+        self.view.controls.append(control)
+        self._drop_oldest()
+        self.refresh()
+        return control
+
+    def update_message(self, control):
+        # a bubble paged out while streaming keeps its text for when it is
+        # paged back in, but cannot be updated on its own meanwhile
+        if any(c is control for c in reversed(self.view.controls)):
+            with metrics.timer("ui.render"):
+                control.update()
+
+    def _drop_oldest(self):
+        extra = len(self) - self.window
+        if extra > 0:
+            # controls[0] is the "earlier messages" control
+            dropped = self.view.controls[1:1 + extra]
+            del self.view.controls[1:1 + extra]
+            self._hidden.extend(self.read_message(c) for c in dropped)
+            metrics.incr("chat_view.dropped", extra)
+
+    def _drop_newest(self):
+        extra = len(self) - self.window
+        if extra > 0:
+            self._newer[:0] = self.view.controls[-extra:]
+            del self.view.controls[-extra:]
+            metrics.incr("chat_view.dropped", extra)
+
+    def has_older(self):
+        return bool(self._hidden) or self._history is None or self._cursor is not None
+
+    def load_older(self):
+        messages = []
+        if self._hidden:
+            take = min(len(self._hidden), self.page_size * 2)
+            messages = self._hidden[-take:]
+            del self._hidden[-take:]
+        elif self._history is not None and self._cursor is not None:
+            with metrics.timer("chat_view.history"):
+                items, self._cursor = self._history(self._cursor, self.page_size)
+            for item in items:
+                messages += [(item["q"], True), (item["a"], False)]
+
+        self.view.controls[1:1] = [self.make_message(text, mine) for text, mine in messages]
+        self._drop_newest()
+        self.refresh()
+        return len(messages)
+
+    def load_newer(self):
+        count = self._take_newer(self.page_size * 2)
+        self.refresh()
+        return count
+
+    def _take_newer(self, count):
+        controls = self._newer[:count]
+        del self._newer[:count]
+        self.view.controls.extend(controls)
+        self._drop_oldest()
+        return len(controls)
+
+    def refresh(self):
+        self.more.visible = self.has_older()
+        self.later.visible = bool(self._newer)
+        with metrics.timer("ui.render"):
+            self.view.update()
+            self.later.update()
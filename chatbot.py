@@ -1,53 +1,86 @@
 # src/chatbot.py
-print("🔥 CHATBOT.PY LOADED 🔥")
-
 import os
-import json
-import re
+import asyncio
+import threading
 import requests
 from datetime import datetime
+from src import metrics
 from src.autocorrect import autocorrect_query
 from src.mathbot import handle_math_query
+from src.lookup_cache import LookupCache
+from src.http_client import RequestCancelled, client as http
+from src.memory_store import DEFAULT_USER, open_memory_store
+from src.recall_index import RecallIndex
+from src.intent_router import ProgrammingAnswers, detect_intent
+from src.correction import CorrectionStage
+from src.knowledge_base import KnowledgeBase
+
+metrics.debug("🔥 CHATBOT.PY LOADED 🔥")
 
 # ---------------- FILE SETUP ---------------- #
 
 DATA_DIR = "src/data"
-MEMORY_FILE = os.path.join(DATA_DIR, "memory.json")
 PROGRAMMING_FILE = os.path.join(DATA_DIR, "programming.json")
+# optional offline article dump, one {"title", "text"} JSON object per line
+ARTICLES_FILE = os.environ.get("DIET_PRO_ARTICLES", os.path.join(DATA_DIR, "articles.jsonl"))
 
 os.makedirs(DATA_DIR, exist_ok=True)
 
-if not os.path.exists(MEMORY_FILE):
-    with open(MEMORY_FILE, "w", encoding="utf-8") as f:
-        json.dump({"chat_history": []}, f, indent=4)
+# SQLite (WAL) by default, DIET_PRO_MEMORY=json keeps the old memory.json file
+memory = open_memory_store(DATA_DIR)
 
-HEADERS = {"User-Agent": "INDB-Diet-Pro/1.0"}
+# wiki/ddg answers keyed on the clean_entity() output
+lookup_cache = LookupCache(os.path.join(DATA_DIR, "lookup_cache.sqlite3"))
+
+# endpoints are module-level so they can be pointed at a local stub server
+WIKI_SEARCH_URL = "https://en.wikipedia.org/w/api.php"
+WIKI_SUMMARY_URL = "https://en.wikipedia.org/api/rest_v1/page/summary/"
+DDG_URL = "https://api.duckduckgo.com/"
 
 last_topic = None
 
 # ---------------- MEMORY ---------------- #
 
-def load_memory():
-    with open(MEMORY_FILE, "r", encoding="utf-8") as f:
-        return json.load(f)
-
-def save_memory(memory):
-    with open(MEMORY_FILE, "w", encoding="utf-8") as f:
-        json.dump(memory, f, indent=4)
-
-def remember_chat(question, answer):
-    memory = load_memory()
-    history = memory.get("chat_history", [])
-    history.append({"q": question, "a": answer})
-    memory["chat_history"] = history[-20:]
-    save_memory(memory)
-
-def recall_previous(msg):
-    memory = load_memory()
-    for item in reversed(memory.get("chat_history", [])):
-        if msg in item["q"]:
-            return item["a"]
-    return None
+# fuzzy recall over the user's whole history; built on first use, then
+# kept up to date by remember_chat()
+REPEAT_SCORE = 0.85     # symmetric: close enough to answer before any network lookup
+SIMILAR_SCORE = 0.75    # one-sided: fallback when the lookups found nothing
+
+recall_indexes = {}
+
+def recall_index(user):
+    index = recall_indexes.get(user)
+    if index is None:
+        index = RecallIndex()
+        for item in memory.history(user):
+            index.add(item["q"], item["a"])
+        index = recall_indexes.setdefault(user, index)
+    return index
+
+def remember_chat(question, answer, user=DEFAULT_USER):
+    with metrics.timer("chat.memory"):
+        memory.add_chat(user, question, answer)
+        if user in recall_indexes:
+            recall_indexes[user].add(question, answer)
+
+def forget_user(user):
+    # a client disconnected: its recall index and cached memory are built
+    # again from the store the next time it asks
+    recall_indexes.pop(user, None)
+    memory.forget(user)
+
+def history_end(user=DEFAULT_USER):
+    return memory.history_end(user)
+
+def history_page(before=None, limit=50, user=DEFAULT_USER):
+    # older Q&As for the transcript's "earlier messages", see memory_store
+    return memory.history_page(user, before, limit)
+
+def recall_previous(msg, user=DEFAULT_USER, min_score=SIMILAR_SCORE, symmetric=False):
+    with metrics.timer("chat.recall"):
+        answer, _ = recall_index(user).search(msg, min_score, symmetric)
+    metrics.incr("chat.recall.hits" if answer else "chat.recall.misses")
+    return answer
 
 # ---------------- ENTITY CLEANING ---------------- #
 
@@ -63,180 +96,262 @@ def clean_entity(msg):
 
 # ---------------- SEARCH ---------------- #
 
-def wikipedia_search(query):
+# lookups raise on network/HTTP errors so only real answers and real misses
+# (None) end up in the cache; `cancel` (a threading.Event) stops the losing
+# lookup of a race early, see search_async
+
+def fetch_wikipedia(query, cancel=None):
+    params = {
+        "action": "opensearch",
+        "search": query,
+        "limit": 1,
+        "namespace": 0,
+        "format": "json"
+    }
+    r = http.get(WIKI_SEARCH_URL, params=params, cancel=cancel)
+    r.raise_for_status()
+    data = r.json()
+
+    if not data[1]:
+        return None
+
+    title = data[1][0].replace(" ", "_")
+    res = http.get(WIKI_SUMMARY_URL + title, cancel=cancel)
+
+    if res.status_code == 404:
+        return None
+    res.raise_for_status()
+    return res.json().get("extract")
+
+def fetch_duckduckgo(query, cancel=None):
+    params = {
+        "q": query,
+        "format": "json",
+        "no_html": 1,
+        "skip_disambig": 1
+    }
+    res = http.get(DDG_URL, params=params, cancel=cancel)
+    res.raise_for_status()
+    data = res.json()
+
+    if data.get("AbstractText"):
+        return data["AbstractText"]
+
+    for t in data.get("RelatedTopics", []):
+        if isinstance(t, dict) and t.get("Text"):
+            return t["Text"]
+    return None
+
+# foods from the planner's table (and the article dump) answer before any
+# network lookup, and keep the bot useful offline
+knowledge = KnowledgeBase(ARTICLES_FILE)
+
+def local_search(query):
+    with metrics.timer("lookup.local"):
+        return knowledge.search(query)
+
+# network failures, open breakers and malformed payloads all count as "no
+# answer" for the caller, but are reported instead of silently swallowed
+LOOKUP_ERRORS = (requests.RequestException, ValueError, LookupError)
+
+def wikipedia_search(query, cancel=None):
     try:
-        search_url = "https://en.wikipedia.org/w/api.php"
-        params = {
-            "action": "opensearch",
-            "search": query,
-            "limit": 1,
-            "namespace": 0,
-            "format": "json"
-        }
-        r = requests.get(search_url, params=params, timeout=6)
-        data = r.json()
-
-        if not data[1]:
-            return None
-
-        title = data[1][0].replace(" ", "_")
-        summary_url = f"https://en.wikipedia.org/api/rest_v1/page/summary/{title}"
-        res = requests.get(summary_url, timeout=6)
-
-        if res.status_code == 200:
-            return res.json().get("extract")
-    except:
+        with metrics.timer("lookup.wiki"):
+            return lookup_cache.cached("wiki", query, lambda q: fetch_wikipedia(q, cancel=cancel))
+    except RequestCancelled:
+        return None
+    except LOOKUP_ERRORS as ex:
+        metrics.incr("lookup.wiki.errors")
+        metrics.warn("⚠️ WIKI :", type(ex).__name__, ex)
         return None
 
-def duckduckgo_search(query):
+def duckduckgo_search(query, cancel=None):
     try:
-        url = "https://api.duckduckgo.com/"
-        params = {
-            "q": query,
-            "format": "json",
-            "no_html": 1,
-            "skip_disambig": 1
-        }
-        res = requests.get(url, params=params, headers=HEADERS, timeout=6)
-        data = res.json()
-
-        if data.get("AbstractText"):
-            return data["AbstractText"]
-
-        for t in data.get("RelatedTopics", []):
-            if isinstance(t, dict) and t.get("Text"):
-                return t["Text"]
-    except:
+        with metrics.timer("lookup.ddg"):
+            return lookup_cache.cached("ddg", query, lambda q: fetch_duckduckgo(q, cancel=cancel))
+    except RequestCancelled:
+        return None
+    except LOOKUP_ERRORS as ex:
+        metrics.incr("lookup.ddg.errors")
+        metrics.warn("⚠️ DDG  :", type(ex).__name__, ex)
         return None
 
 # ---------------- FACT MEMORY ---------------- #
 
-def remember_fact(msg):
-    memory = load_memory()
+def remember_fact(msg, user=DEFAULT_USER):
+    with metrics.timer("chat.memory"):
+        return _remember_fact(msg, user)
 
+def _remember_fact(msg, user):
     if "my name is" in msg:
         name = msg.split("my name is")[-1].strip().title()
-        memory["user_name"] = name
-        save_memory(memory)
+        memory.set_facts(user, user_name=name)
         return f"Got it 👍 Your name is {name}."
 
     if "my birthdate is" in msg or "my dob is" in msg:
         date_str = msg.replace("my birthdate is", "").replace("my dob is", "").strip()
         try:
             dob = datetime.strptime(date_str, "%d-%m-%Y")
-            memory["dob"] = date_str
-            memory["age"] = datetime.now().year - dob.year
-            save_memory(memory)
+            memory.set_facts(user, dob=date_str, age=datetime.now().year - dob.year)
             return "Your birthdate is saved."
         except:
             return "Please use DD-MM-YYYY format."
 
     return None
 
-def recall_fact(msg):
-    memory = load_memory()
+def recall_fact(msg, user=DEFAULT_USER):
+    with metrics.timer("chat.memory"):
+        facts = memory.facts(user)
 
-    if "my name" in msg and "user_name" in memory:
-        return memory["user_name"]
+    if "my name" in msg and "user_name" in facts:
+        return facts["user_name"]
 
-    if "my birthdate" in msg and "dob" in memory:
-        return memory["dob"]
+    if "my birthdate" in msg and "dob" in facts:
+        return facts["dob"]
 
-    if "my age" in msg and "age" in memory:
-        return str(memory["age"])
+    if "my age" in msg and "age" in facts:
+        return str(facts["age"])
 
     return None
 
 # ---------------- TECH / PROGRAMMING ---------------- #
 
-def get_programming_answer(msg):
-    if not os.path.exists(PROGRAMMING_FILE):
-        return None
-
-    with open(PROGRAMMING_FILE, "r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    for key, value in data.items():
-        if key in msg:
-            return value
-    return None
-
-# ---------------- INTENT DETECTION ---------------- #
-
-def detect_intent(msg):
-    if re.search(r"\b(hi|hello|hey)\b", msg):
-        return "SMALL_TALK"
+programming_answers = ProgrammingAnswers(PROGRAMMING_FILE)
 
-    if any(k in msg for k in ["sin", "cos", "area", "derivative", "+", "-", "*", "/", "^"]):
-        return "MATH"
+def get_programming_answer(msg):
+    return programming_answers.lookup(msg)
 
-    if any(k in msg for k in ["python", "java", "c++", "programming"]):
-        return "TECH"
+# ---------------- AUTOCORRECT ---------------- #
 
-    if any(k in msg for k in ["my name", "my age", "my birth"]):
-        return "PERSONAL"
+# memoized, skips short / already-valid messages, see src/correction.py
+correction = CorrectionStage(autocorrect_query)
 
-    return "FACT"
+metrics.register_source("lookup_cache", lambda: lookup_cache.stats)
+metrics.register_source("autocorrect", lambda: correction.stats)
+metrics.register_source("http", http.stats)
+metrics.register_source("knowledge", lambda: knowledge.stats)
 
 # ---------------- MAIN RESPONSE ---------------- #
 
-def get_smart_response(message: str) -> str:
+def route_message(message, user=DEFAULT_USER):
+    # everything before the network lookup; returns (message, msg, reply)
+    # where reply is None when the question still needs a factual lookup
     original = message
-    corrected = autocorrect_query(message)
+    metrics.incr("chat.messages")
+    with metrics.timer("chat.autocorrect"):
+        corrected = correction.correct(message)
 
-    print("📝 USER :", original)
-    print("🧠 FIXED:", corrected)
+    metrics.debug("📝 USER :", original)
+    metrics.debug("🧠 FIXED:", corrected, f"({correction.stats['last_ms']:.2f} ms)")
 
     # 🔥 use corrected text from now on
     message = corrected
-    global last_topic
 
     msg = message.lower().strip()
-    print("🧪 MSG:", msg)
+    metrics.debug("🧪 MSG:", msg)
 
-    intent = detect_intent(msg)
-    print("🧠 INTENT:", intent)
+    with metrics.timer("chat.intent"):
+        intent = detect_intent(msg)
+    metrics.incr(f"chat.intent.{intent}")
+    metrics.debug("🧠 INTENT:", intent)
 
     # 1️⃣ Small talk
     if intent == "SMALL_TALK":
-        return "Hey 👋 How can I help you?"
+        return message, msg, "Hey 👋 How can I help you?"
 
     # 2️⃣ Math → delegate
     if intent == "MATH":
-        math_answer = handle_math_query(msg)
+        with metrics.timer("chat.math"):
+            math_answer = handle_math_query(msg)
         if math_answer != "Unknown math query":
-            return math_answer
+            return message, msg, math_answer
 
     # 3️⃣ Save personal facts
-    saved = remember_fact(msg)
+    saved = remember_fact(msg, user)
     if saved:
-        remember_chat(message, saved)
-        return saved
+        remember_chat(message, saved, user)
+        return message, msg, saved
 
     # 4️⃣ Recall personal facts
-    recalled = recall_fact(msg)
+    recalled = recall_fact(msg, user)
     if recalled:
-        return recalled
+        return message, msg, recalled
 
     # 5️⃣ Programming / Tech
     if intent == "TECH":
         tech = get_programming_answer(msg)
         if tech:
-            remember_chat(message, tech)
-            return tech
+            remember_chat(message, tech, user)
+            return message, msg, tech
 
-    # 6️⃣ Factual lookup
-    entity = clean_entity(msg)
-    last_topic = entity
+    # ♻️ Repeat of a question we already answered
+    past = recall_previous(msg, user, REPEAT_SCORE, symmetric=True)
+    if past:
+        return message, msg, past
+
+    return message, msg, None
 
-    summary = wikipedia_search(entity) or duckduckgo_search(entity)
+def finish_lookup(message, msg, summary, user=DEFAULT_USER):
     if summary:
-        remember_chat(message, summary)
+        remember_chat(message, summary, user)
         return summary
 
     # 7️⃣ Recall similar past question
-    past = recall_previous(msg)
+    past = recall_previous(msg, user)
     if past:
         return past
 
     return "I couldn’t find a direct answer to that."
+
+def get_smart_response(message: str, user: str = DEFAULT_USER) -> str:
+    global last_topic
+
+    message, msg, reply = route_message(message, user)
+    if reply is not None:
+        return reply
+
+    # 6️⃣ Factual lookup
+    entity = clean_entity(msg)
+    last_topic = entity
+
+    summary = local_search(entity) or wikipedia_search(entity) or duckduckgo_search(entity)
+    return finish_lookup(message, msg, summary, user)
+
+# ---------------- ASYNC RESPONSE ---------------- #
+
+async def search_async(entity):
+    # race both backends and keep the first useful answer; the blocking
+    # lookups run in worker threads so the UI event loop stays free.
+    # Cancelling a task does not stop its thread, so the losers are told
+    # through `cancel` and give their HTTP slot back at the next step
+    cancel = threading.Event()
+    tasks = [
+        asyncio.create_task(asyncio.to_thread(wikipedia_search, entity, cancel)),
+        asyncio.create_task(asyncio.to_thread(duckduckgo_search, entity, cancel))
+    ]
+    try:
+        for done in asyncio.as_completed(tasks):
+            result = await done
+            if result:
+                return result
+        return None
+    finally:
+        cancel.set()
+        for task in tasks:
+            task.cancel()
+
+async def get_smart_response_async(message: str, user: str = DEFAULT_USER) -> str:
+    global last_topic
+
+    message, msg, reply = await asyncio.to_thread(route_message, message, user)
+    if reply is not None:
+        return reply
+
+    # 6️⃣ Factual lookup
+    entity = clean_entity(msg)
+    last_topic = entity
+
+    summary = await asyncio.to_thread(local_search, entity)
+    if not summary:
+        summary = await search_async(entity)
+    return await asyncio.to_thread(finish_lookup, message, msg, summary, user)
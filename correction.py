@@ -0,0 +1,95 @@
+# src/correction.py
+import re
+import time
+import threading
+from collections import OrderedDict
+from src.intent_router import INTENT_KEYWORDS
+
+# ---------------- SETTINGS ---------------- #
+
+MEMO_SIZE = 4096        # corrected messages remembered
+MIN_LENGTH = 4          # shorter messages are never corrected
+
+# words the bot sees all the time; anything made only of these is left alone
+VOCABULARY = """
+a an the is are was were be been am i me my you your we our it its this that these those
+what who whom which when where why how much many more most less least few lot lots of in on
+at to for from with without by about into over under and or but not no yes if then than so
+do does did can could should would will shall may might must have has had get got give tell
+explain show list find make want need like know please thanks thank ok okay good best better
+bad high low rich free per day daily week meal meals food foods diet plan healthy health eat
+eating drink drinking water weight loss gain lose maintenance body fat protein proteins carb
+carbs carbohydrate carbohydrates fiber fibre sugar salt sodium calorie calories kcal vitamin
+vitamins mineral minerals iron calcium zinc potassium magnesium omega cholesterol gluten
+lactose allergy allergies allergic vegan veg vegetarian non egg eggs milk dairy paneer dal
+rice roti chapati naan paratha idli dosa sambhar chicken mutton fish prawn biryani curry
+korma masala tikka bhurji makhani apple banana yogurt curd ghee butter cheese oats bread
+fruit fruits vegetable vegetables nuts seeds breakfast lunch dinner snack snacks bmi bmr
+tdee age name birthdate dob gram grams g kg cm
+"""
+
+WORD = re.compile(r"[a-z]+")
+
+# ---------------- CORRECTION STAGE ---------------- #
+
+class CorrectionStage:
+    # memoized front of the autocorrect step: short, known-word and repeated
+    # messages skip it, everything else goes to the full corrector once and
+    # is remembered. The vocabulary only says a message needs no correction;
+    # it is far too small to correct with (real words outside it would be
+    # "fixed" into ones inside it).
+
+    def __init__(self, corrector, vocabulary=(), memo_size=MEMO_SIZE):
+        self.corrector = corrector
+        words = set(VOCABULARY.split()) | set(vocabulary)
+        for _, keywords in INTENT_KEYWORDS:
+            for kw in keywords:
+                words.update(WORD.findall(kw))
+        self.vocabulary = frozenset(words)
+        self.memo_size = memo_size
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "skipped": 0, "memo_hits": 0,
+                      "delegated": 0, "total_ms": 0.0, "last_ms": 0.0}
+
+    def needs_correction(self, message):
+        text = message.strip().lower()
+        if len(text) < MIN_LENGTH:
+            return False
+        words = WORD.findall(text)
+        return any(w not in self.vocabulary for w in words)
+
+    def correct(self, message):
+        start = time.perf_counter()
+        try:
+            return self._correct(message)
+        finally:
+            ms = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self.stats["calls"] += 1
+                self.stats["total_ms"] += ms
+                self.stats["last_ms"] = ms
+
+    def _correct(self, message):
+        if not self.needs_correction(message):
+            self._count("skipped")
+            return message
+
+        with self._lock:
+            if message in self._memo:
+                self._memo.move_to_end(message)
+                self.stats["memo_hits"] += 1
+                return self._memo[message]
+
+        corrected = self.corrector(message)
+        self._count("delegated")
+
+        with self._lock:
+            self._memo[message] = corrected
+            while len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+        return corrected
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
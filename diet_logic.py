@@ -1,32 +1,179 @@
 import pandas as pd
 import numpy as np
 import math
-import random
+import time
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from src import metrics
+from src.food_store import STORE_DIR, open_food_table, source_stamp
+
+class InfeasiblePlanError(ValueError):
+    pass
+
+MEALS = ("breakfast", "lunch", "snack", "dinner")
+MEAL_SHARES = np.array([0.22, 0.28, 0.12, 0.38])
+PREFERENCES = ("Veg", "Egg", "Non-Veg", "Veg+Egg", "Egg+Non-Veg", "Veg+Egg+Non-Veg")
+NUTRIENTS = ("kcal", "prot", "carb", "fat", "fiber")
+SUBSTITUTE_TOLERANCE = {"kcal": 0.25}      # relative, per 100 g
+ACTIVITY_MULT = {
+    "Sedentary(No activity)": 1.2,
+    "Light(Walk)": 1.375,
+    "Moderate(Walk+Light Excersises)": 1.55,
+    "Active(Light workout GYM)": 1.725,
+    "Very active(Workout GYM + Sports)": 1.9
+}
+
+def _is_male(gender):
+    # "m", "male", " Male " ... for one value or an array of them, so the
+    # scalar and bulk formulas pick the same branch for every spelling
+    if gender is None or isinstance(gender, str):
+        return str(gender).strip().lower() in ("m", "male")
+    gender = pd.Series(np.atleast_1d(np.asarray(gender, dtype=object)), dtype=object)
+    return gender.astype(str).str.strip().str.lower().isin(["m", "male"]).to_numpy()
+
+def make_rng(seed=None):
+    # every plan draws from its own Generator, so threads never share RNG
+    # state; a seed is picked when none is given and returned with the plan
+    # so the same plan can be produced again
+    if seed is None:
+        seed = int(np.random.SeedSequence().entropy % 2**32)
+    return seed, np.random.default_rng(seed)
+
+# ---------------- COMPACT PLANS ---------------- #
+
+# One plan as 4 fixed-size meal records plus a few scalars instead of nested
+# dicts and preformatted strings; food names and the dict / text forms are
+# only produced when asked for. PlanBatch keeps many plans in two record
+# arrays, which is what the batch export and caches hold.
+MEAL_DTYPE = np.dtype([("food", np.int32), ("portion_g", np.int16), ("kcal", np.int16),
+                       ("prot", np.float64), ("carb", np.float64), ("fat", np.float64)])
+BMI_STATUSES = ("Underweight", "Normal", "Overweight", "Obese")
+PLAN_DTYPE = np.dtype([("target_calories", np.int32), ("min_fat", np.float64), ("max_fat", np.float64),
+                       ("min_protein", np.float64), ("bmi", np.float64), ("bmi_status", np.int8),
+                       ("body_fat", np.float64), ("seed", np.int64)])
+
+class CompactPlan:
+    __slots__ = ("meals", "target_calories", "limits", "bmi", "bmi_status", "body_fat", "seed", "_cols")
+
+    def __init__(self, meals, target_calories, limits, bmi_status, body_fat, seed, cols):
+        self.meals = meals                          # MEAL_DTYPE records, one per meal
+        self.target_calories = int(target_calories)
+        self.limits = tuple(limits)
+        self.bmi, self.bmi_status = bmi_status if bmi_status else (None, None)
+        self.body_fat = body_fat
+        self.seed = seed
+        self._cols = cols                           # the planner's read-only columns
+
+    @property
+    def totals(self):
+        # same summation order as the dict form, so the rounding matches
+        m = self.meals
+        return (int(sum(m["kcal"].tolist())), sum(m["prot"].tolist()),
+                sum(m["carb"].tolist()), sum(m["fat"].tolist()))
+
+    @property
+    def constraints_met(self):
+        min_fat, max_fat, min_protein = self.limits
+        _, prot, _, fat = self.totals
+        return bool(min_fat <= fat <= max_fat and prot >= min_protein)
+
+    def food(self, i):
+        return str(self._cols["name"][self.meals["food"][i]])[:25]
+
+    def meal_lines(self):
+        # (meal, food, category, kcal) per meal, for the UI
+        for i, meal in enumerate(MEALS):
+            yield meal, self.food(i), self._cols["category"][self.meals["food"][i]], int(self.meals["kcal"][i])
+
+    def to_dict(self):
+        # the nested dict plan() returns by default
+        meals = {}
+        for i, (meal, rec) in enumerate(zip(MEALS, self.meals.tolist())):
+            _, portion, kcal, prot, carb, fat = rec
+            meals[meal] = {
+                "food": self.food(i),
+                "type": self._cols["category"][self.meals["food"][i]],
+                "portion_g": portion,
+                "total_kcal": kcal,
+                "prot_g": round(prot, 1),
+                "carb_g": round(carb, 1),
+                "fat_g": round(fat, 1)
+            }
+        total_cal, total_prot, total_carb, total_fat = self.totals
+        min_fat, max_fat, min_protein = self.limits
+        return {
+            "meals": meals,
+            "target_calories": self.target_calories,
+            "total_calories": total_cal,
+            "total_prot": round(total_prot, 1),
+            "total_carb": round(total_carb, 1),
+            "total_fat": round(total_fat, 1),
+            "protein_target": f">= {round(min_protein,1)} g" if min_protein > 0 else None,
+            "fat_range": f"{round(min_fat,1)}–{round(max_fat,1)} g",
+            "bmi": self.bmi,
+            "bmi_status": self.bmi_status,
+            "body_fat": self.body_fat,
+            "constraints_met": self.constraints_met,
+            "seed": self.seed
+        }
+
+class PlanBatch:
+    # many plans as a (plans, meals) MEAL_DTYPE array and a PLAN_DTYPE array;
+    # batch[i] is a CompactPlan view, to_bytes() / from_bytes() are plain
+    # buffer copies
+
+    __slots__ = ("meals", "plans", "_cols")
+
+    def __init__(self, meals, plans, cols):
+        self.meals = meals
+        self.plans = plans
+        self._cols = cols
+
+    def __len__(self):
+        return len(self.plans)
+
+    def __getitem__(self, i):
+        p = self.plans[i]
+        status = int(p["bmi_status"])
+        bmi_status = (float(p["bmi"]), BMI_STATUSES[status]) if status >= 0 else None
+        body_fat = None if np.isnan(p["body_fat"]) else float(p["body_fat"])
+        limits = (p["min_fat"], p["max_fat"], p["min_protein"])
+        return CompactPlan(self.meals[i], p["target_calories"], limits, bmi_status, body_fat,
+                           int(p["seed"]), self._cols)
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    @property
+    def nbytes(self):
+        return self.meals.nbytes + self.plans.nbytes
+
+    def to_bytes(self):
+        return self.meals.tobytes() + self.plans.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data, cols):
+        # food positions refer to the table of `cols`, load with the same table
+        n = len(data) // (MEAL_DTYPE.itemsize * len(MEALS) + PLAN_DTYPE.itemsize)
+        split = n * len(MEALS) * MEAL_DTYPE.itemsize
+        meals = np.frombuffer(data[:split], dtype=MEAL_DTYPE).reshape(n, len(MEALS))
+        plans = np.frombuffer(data[split:], dtype=PLAN_DTYPE)
+        return cls(meals, plans, cols)
 
 class SimpleINDBDiet:
-    def __init__(self):
-        np.random.seed(42)
-        foods = []
-        indian_foods = ["Chicken Curry", "Egg Bhurji", "Fish Fry", "Paneer Tikka",
-                        "Dal Makhani", "Rice", "Roti", "Idli Sambhar", "Dosa",
-                        "Apple", "Boiled Egg", "Yogurt", "Chicken Biryani", 
-                        "Mutton Korma", "Prawn Masala"]
-
-        for i in range(1014):
-            food = random.choice(indian_foods) + f" #{i}"
-            foods.append({
-                'code': i+1,
-                'name': food,
-                'kcal': np.random.randint(80, 450),
-                'prot': np.random.uniform(3, 25),
-                'carb': np.random.uniform(10, 70),
-                'fat': np.random.uniform(2, 20),
-                'fiber': np.random.uniform(0, 8),
-                'category': 'Non-Veg' if any(x in food.lower() for x in ['chicken','egg','fish','biryani','mutton','prawn']) else 'Veg',
-                'allergens': random.choice(['None', 'milk', 'egg', 'gluten'])
-            })
-        self.df = pd.DataFrame(foods)
-        print(f"✅ Loaded {len(self.df)} INDB foods")
+    def __init__(self, store_dir=STORE_DIR):
+        # columnar store under src/data is built on first run and memory-mapped
+        # afterwards; store_dir=None builds the table in memory only
+        self.df, self.store_info = open_food_table(store_dir)
+        self._build_indexes()
+        metrics.debug(f"✅ Loaded {len(self.df)} INDB foods ({self.store_info['cold_start_s']}s)")
+
+    @property
+    def table_stamp(self):
+        # differs whenever the table is rebuilt or reloaded, for caches of
+        # anything derived from it
+        info = self.store_info
+        return info["source"], info["source_mtime"], info["rows"], id(self.df)
 
     def calculate_bmi(self, weight, height):
         bmi = weight / ((height / 100) ** 2)
@@ -37,26 +184,19 @@ class SimpleINDBDiet:
         h_in = height_cm * 0.393701
         n_in = neck_cm * 0.393701
         w_in = waist_cm * 0.393701
-        if gender == "male":
+        if _is_male(gender):
             body_fat = 86.010*math.log10(w_in-n_in) - 70.041*math.log10(h_in) + 36.76
         else:
             body_fat = 163.205*math.log10(w_in*1.1-n_in) - 97.684*math.log10(h_in) - 78.387
         return round(max(5, min(50, body_fat)), 1), "US Navy"
 
     def bmr(self, age, gender, weight, height, activity, goal):
-        if gender == "m":
+        if _is_male(gender):
             bmr = 88.362 + (13.397 * weight) + (4.799 * height) - (5.677 * age)
         else:
             bmr = 447.593 + (9.247 * weight) + (3.098 * height) - (4.330 * age)
 
-        mult = {
-            "Sedentary(No activity)": 1.2,
-            "Light(Walk)": 1.375,
-            "Moderate(Walk+Light Excersises)": 1.55,
-            "Active(Light workout GYM)": 1.725,
-            "Very active(Workout GYM + Sports)": 1.9
-        }
-        tdee = bmr * mult.get(activity, 1.55)
+        tdee = bmr * ACTIVITY_MULT.get(activity, 1.55)
 
         if goal == "Weight loss":
             calories = max(1200, int(tdee * 0.75))
@@ -69,61 +209,237 @@ class SimpleINDBDiet:
             calories = max(2000, min(2500, calories))
         return calories
 
-    def plan(self, age, gender, weight, height, bmi_status, body_fat,
-        neck, waist, activity, goal, preference, allergy):
+    # ---------------- BULK BODY METRICS ---------------- #
 
-        calories = self.bmr(age, gender, weight, height, activity, goal)
-        df = self.df.copy()
+    # Array versions of the three methods above for whole populations: same
+    # formulas and goal clamping, one NumPy pass, and NaN (status None) for
+    # rows whose inputs are missing, non-positive or outside log10's domain
+    # instead of raising.
 
-        if allergy and allergy != "None":
-            df = df[df["allergens"].str.lower() != allergy.lower()]
+    def bulk_bmi(self, weight, height):
+        weight = np.asarray(weight, dtype=float)
+        height = np.asarray(height, dtype=float)
+        valid = (weight > 0) & (height > 0)
+        with np.errstate(all="ignore"):
+            bmi = np.where(valid, weight / (height / 100) ** 2, np.nan)
 
-        pref_map = {"Veg": 1,"Egg": 2,"Non-Veg": 3,"Veg+Egg": 4,"Egg+Non-Veg": 5,"Veg+Egg+Non-Veg": 6}
+        status = np.select(
+            [~valid, bmi < 18.5, bmi < 25, bmi < 30],
+            [None, "Underweight", "Normal", "Overweight"],
+            default="Obese"
+        )
+        return np.round(bmi, 1), status
 
-        preference_num = pref_map.get(preference, 6)
+    def bulk_navy_body_fat(self, gender, height_cm, neck_cm, waist_cm):
+        male = _is_male(gender)
+        h_in = np.asarray(height_cm, dtype=float) * 0.393701
+        n_in = np.asarray(neck_cm, dtype=float) * 0.393701
+        w_in = np.asarray(waist_cm, dtype=float) * 0.393701
 
-        if preference_num == 1:  # Veg only
-            df = df[df["category"] == "Veg"]
+        girth = np.where(male, w_in - n_in, w_in * 1.1 - n_in)
+        valid = (girth > 0) & (h_in > 0) & (n_in > 0)
+        with np.errstate(all="ignore"):
+            body_fat = np.where(
+                male,
+                86.010*np.log10(girth) - 70.041*np.log10(h_in) + 36.76,
+                163.205*np.log10(girth) - 97.684*np.log10(h_in) - 78.387
+            )
+        body_fat = np.where(valid, np.clip(body_fat, 5, 50), np.nan)
+        return np.round(body_fat, 1)
 
-        elif preference_num == 2:  # Egg only
-            df = df[df["name"].str.contains("egg", case=False, na=False)]
+    def bulk_bmr(self, age, gender, weight, height, activity, goal):
+        age = np.asarray(age, dtype=float)
+        weight = np.asarray(weight, dtype=float)
+        height = np.asarray(height, dtype=float)
+        male = _is_male(gender)
 
-        elif preference_num == 3:  # Non-Veg (no egg)
-            df = df[
-                (df["category"] == "Non-Veg") &
-                (~df["name"].str.contains("egg", case=False, na=False))
-            ]
+        bmr = np.where(
+            male,
+            88.362 + (13.397 * weight) + (4.799 * height) - (5.677 * age),
+            447.593 + (9.247 * weight) + (3.098 * height) - (4.330 * age)
+        )
+        mult = pd.Series(np.atleast_1d(np.asarray(activity, dtype=object))).map(ACTIVITY_MULT)
+        tdee = bmr * mult.fillna(1.55).to_numpy()
 
-        elif preference_num == 4:  # Veg + Egg
-            df = df[
-                (df["category"] == "Veg") |
-                (df["name"].str.contains("egg", case=False, na=False))
-            ]
+        goal = np.asarray(goal, dtype=object)
+        loss = np.maximum(1200, np.trunc(tdee * 0.75))
+        gain = np.minimum(3500, np.trunc(tdee * 1.25))
+        calories = np.select(
+            [goal == "Weight loss", goal == "Weight Gain"],
+            [np.where(loss > 2000, 1900, loss), np.where(gain < 2500, 2600, gain)],
+            default=np.clip(np.trunc(tdee), 2000, 2500)
+        )
 
-        elif preference_num == 5:  # Egg + Non-Veg
-            df = df[
-                (df["name"].str.contains("egg", case=False, na=False)) |
-                (
-                    (df["category"] == "Non-Veg") &
-                    (~df["name"].str.contains("egg", case=False, na=False))
-                )
-            ]
+        valid = (weight > 0) & (height > 0) & (age > 0)
+        return np.where(valid, calories, np.nan)
 
-        elif preference_num == 6:  # Everything
-            df = df
+    def body_metrics(self, people):
+        # people: DataFrame (or dict of arrays) with weight and height, plus
+        # age / gender / activity / goal for calories and neck / waist for
+        # body fat; returns bmi, bmi_status, body_fat, calories per row
+        people = pd.DataFrame(people)
+        n = len(people)
 
-    
-        if len(df) == 0:
-            df = self.df
+        def col(name, default=np.nan):
+            return people[name].to_numpy() if name in people else np.full(n, default, dtype=object)
 
-        targets = {
-            "breakfast": calories * 0.22,
-            "lunch": calories * 0.28,
-            "snack": calories * 0.12,
-            "dinner": calories * 0.38
+        with metrics.timer("body_metrics"):
+            gender = col("gender", None)
+            bmi, status = self.bulk_bmi(col("weight"), col("height"))
+            body_fat = self.bulk_navy_body_fat(gender, col("height"), col("neck"), col("waist"))
+            calories = self.bulk_bmr(col("age"), gender, col("weight"), col("height"),
+                                     col("activity", None), col("goal", None))
+        metrics.incr("body_metrics.rows", n)
+
+        return pd.DataFrame({
+            "bmi": bmi,
+            "bmi_status": status,
+            "body_fat": body_fat,
+            "calories": calories
+        }, index=people.index)
+
+    # ---------------- FOOD INDEXES ---------------- #
+
+    def _build_indexes(self):
+        # every (preference, allergen) combination is resolved once here, so
+        # plan() only has to look up an array of row positions
+        df = self.df
+        is_veg = (df["category"] == "Veg").to_numpy()
+        is_non_veg = (df["category"] == "Non-Veg").to_numpy()
+        has_egg = df["name"].str.contains("egg", case=False, na=False).to_numpy()
+        everything = np.ones(len(df), dtype=bool)
+
+        pref_masks = {
+            "Veg": is_veg,                                      # Veg only
+            "Egg": has_egg,                                     # Egg only
+            "Non-Veg": is_non_veg & ~has_egg,                   # Non-Veg (no egg)
+            "Veg+Egg": is_veg | has_egg,                        # Veg + Egg
+            "Egg+Non-Veg": has_egg | (is_non_veg & ~has_egg),   # Egg + Non-Veg
+            "Veg+Egg+Non-Veg": everything                       # Everything
         }
 
+        allergens = df["allergens"].str.lower().to_numpy()
+        allergy_masks = {"none": everything}
+        for allergen in np.unique(allergens):
+            if allergen != "none":
+                allergy_masks[allergen] = allergens != allergen
+
+        all_rows = np.arange(len(df))
+        all_rows.setflags(write=False)
+        self.food_index = {}
+        for pref, pref_mask in pref_masks.items():
+            for allergen, allergy_mask in allergy_masks.items():
+                rows = np.flatnonzero(pref_mask & allergy_mask)
+                rows.setflags(write=False)
+                self.food_index[(pref, allergen)] = rows if len(rows) else all_rows
+
+        # same pools sorted by kcal, for the binary search in _solve()
+        kcal = df["kcal"].to_numpy()
+        self.kcal_index = {}
+        for key, rows in self.food_index.items():
+            order = rows[np.argsort(kcal[rows], kind="stable")]
+            order.setflags(write=False)
+            self.kcal_index[key] = (order, kcal[order])
+
+        self._cols = {c: df[c].to_numpy() for c in ["name", "category", "kcal", "prot", "carb", "fat"]}
+        for values in self._cols.values():
+            values.setflags(write=False)
+
+        # nutrient vectors per 100 g, z-scored so kcal does not drown out the
+        # grams, for the nearest-neighbour search in substitutes()
+        nutrients = df[list(NUTRIENTS)].to_numpy(dtype=float)
+        scale = nutrients.std(axis=0)
+        scale[scale == 0] = 1
+        self._nutrients = nutrients
+        self._features = ((nutrients - nutrients.mean(axis=0)) / scale).astype(np.float32)
+        self._nutrients.setflags(write=False)
+        self._features.setflags(write=False)
+        self._name_pos = {}
+        for i, name in enumerate(df["name"].astype(str).str.lower()):
+            self._name_pos.setdefault(name, i)
+
+    def _index_key(self, preference, allergy):
+        if preference not in PREFERENCES:
+            preference = "Veg+Egg+Non-Veg"
+        # an empty CSV cell arrives as NaN
+        allergen = allergy.lower() if isinstance(allergy, str) and allergy else "none"
+        if (preference, allergen) not in self.food_index:
+            allergen = "none"   # allergen that no food carries filters nothing
+        return preference, allergen
+
+    def food_positions(self, preference, allergy):
+        return self.food_index[self._index_key(preference, allergy)]
+
+    def foods_for(self, preference, allergy):
+        return self.df.iloc[self.food_positions(preference, allergy)]
+
+    def foods_by_kcal(self, preference, allergy):
+        return self.kcal_index[self._index_key(preference, allergy)]
+
+    # ---------------- SUBSTITUTES ---------------- #
+
+    def find_food(self, name):
+        # exact name first, then the first food starting with it (plan
+        # results cut names to 25 characters)
+        name = str(name).strip().lower()
+        pos = self._name_pos.get(name)
+        if pos is None and name:
+            pos = next((i for n, i in self._name_pos.items() if n.startswith(name)), None)
+        return pos
+
+    def substitutes(self, food, k=5, preference=None, allergy=None, tolerance=None,
+                    lower=(), higher=()):
+        # foods closest in kcal/prot/carb/fat/fiber to `food` (a name or a row
+        # position) among those allowed by preference/allergy. tolerance maps
+        # a nutrient to the relative difference allowed; nutrients in
+        # lower / higher must move that way and are left out of the distance.
+        pos = food if isinstance(food, (int, np.integer)) else self.find_food(food)
+        if pos is None:
+            raise KeyError(f"unknown food: {food}")
+        tolerance = SUBSTITUTE_TOLERANCE if tolerance is None else tolerance
+
+        with metrics.timer("substitutes"):
+            ref = self._nutrients[pos]
+            if "kcal" in tolerance:
+                # the kcal-sorted pool narrows the search to the window first
+                order, kcal = self.foods_by_kcal(preference, allergy)
+                width = tolerance["kcal"] * max(abs(ref[0]), 1)
+                lo = np.searchsorted(kcal, ref[0] - width, side="left")
+                hi = np.searchsorted(kcal, ref[0] + width, side="right")
+                rows = order[lo:hi]
+            else:
+                rows = self.food_positions(preference, allergy)
+            values = self._nutrients[rows]
+            keep = rows != pos
+            for nutrient, tol in tolerance.items():
+                j = NUTRIENTS.index(nutrient)
+                keep &= np.abs(values[:, j] - ref[j]) <= tol * max(abs(ref[j]), 1)
+            for j in map(NUTRIENTS.index, lower):
+                keep &= values[:, j] < ref[j]
+            for j in map(NUTRIENTS.index, higher):
+                keep &= values[:, j] > ref[j]
+
+            rows = rows[keep]
+            weights = np.ones(len(NUTRIENTS), dtype=np.float32)
+            weights[[NUTRIENTS.index(n) for n in (*lower, *higher)]] = 0
+            dist = (((self._features[rows] - self._features[pos]) ** 2) * weights).sum(axis=1)
+            if len(rows) > k:
+                top = np.argpartition(dist, k)[:k]
+                rows, dist = rows[top], dist[top]
+            order = np.argsort(dist, kind="stable")
+
+        return [
+            {
+                "food": str(self._cols["name"][i]),
+                "type": self._cols["category"][i],
+                **{n: round(float(self._nutrients[i, j]), 1) for j, n in enumerate(NUTRIENTS)},
+                "distance": round(float(np.sqrt(d)), 3)
+            }
+            for i, d in zip(rows[order], dist[order])
+        ]
+
     # 🎯 GOAL-BASED MACRO CONSTRAINTS
+    def _macro_limits(self, goal, weight):
         if goal == "Weight loss":
             min_fat = weight * 0.6
             max_fat = weight * 0.7
@@ -139,45 +455,83 @@ class SimpleINDBDiet:
             max_fat = float("inf")
             min_protein = 0
 
+        return min_fat, max_fat, min_protein
+
+    def plan(self, age, gender, weight, height, bmi_status, body_fat,
+        neck, waist, activity, goal, preference, allergy, solver="sample", seed=None, compact=False):
+
+        metrics.incr("plan.calls")
+        seed, rng = make_rng(seed)
+        calories = self.bmr(age, gender, weight, height, activity, goal)
+        with metrics.timer("plan.filter"):
+            rows = self.food_positions(preference, allergy)
+        cols = self._cols
+
+        targets = calories * MEAL_SHARES
+        min_fat, max_fat, min_protein = self._macro_limits(goal, weight)
+        limits = (min_fat, max_fat, min_protein)
+
+        if solver == "exact":
+            try:
+                with metrics.timer("plan.solve"):
+                    picks, portions = self._solve(preference, allergy, targets, limits)
+            except InfeasiblePlanError:
+                metrics.incr("plan.infeasible")
+                raise
+            return self._plan_result(picks, portions, calories, limits, bmi_status, body_fat, seed, compact)
+
     # 🔁 Retry loop to satisfy constraints
-        for _ in range(60):
-            meals = {}
-            total_prot = total_carb = total_fat = total_cal = 0
-
-            for meal, target in targets.items():
-                available = df.sample(n=min(30, len(df)))
-                available["cal_diff"] = abs(available["kcal"] - target)
-                best_food = available.loc[available["cal_diff"].idxmin()]
-
-                portion = max(100, min(400, int(target * 100 / best_food["kcal"])))
-
-                kcal = int(best_food["kcal"] * portion / 100)
-                prot = best_food["prot"] * portion / 100
-                carb = best_food["carb"] * portion / 100
-                fat = best_food["fat"] * portion / 100
-
-                meals[meal] = {
-                    "food": str(best_food["name"])[:25],
-                    "type": best_food["category"],
-                    "portion_g": portion,
-                    "total_kcal": kcal,
-                    "prot_g": round(prot, 1),
-                    "carb_g": round(carb, 1),
-                    "fat_g": round(fat, 1)
-                }
-
-                total_cal += kcal
-                total_prot += prot
-                total_carb += carb
-                total_fat += fat
-
-        # ✅ ACCEPT PLAN ONLY IF CONSTRAINTS ARE MET
-            if (
-                min_fat <= total_fat <= max_fat
-                and total_prot >= min_protein
-            ):
-                break
+        with metrics.timer("plan.sampling"):
+            for attempt in range(60):
+                picks, portions = [], []
+                total_prot = total_fat = 0
 
+                for target in targets:
+                    available = rng.choice(rows, size=min(30, len(rows)), replace=False)
+                    best = available[np.abs(cols["kcal"][available] - target).argmin()]
+                    best_kcal = cols["kcal"][best]
+
+                    portion = max(100, min(400, int(target * 100 / best_kcal)))
+                    picks.append(best)
+                    portions.append(portion)
+
+                    total_prot += cols["prot"][best] * portion / 100
+                    total_fat += cols["fat"][best] * portion / 100
+
+            # ✅ ACCEPT PLAN ONLY IF CONSTRAINTS ARE MET
+                if (
+                    min_fat <= total_fat <= max_fat
+                    and total_prot >= min_protein
+                ):
+                    break
+            else:
+                metrics.incr("plan.constraint_failures")
+        metrics.incr("plan.retries", attempt)
+
+        return self._plan_result(picks, portions, calories, limits, bmi_status, body_fat, seed, compact)
+
+    def _plan_result(self, picks, portions, calories, limits, bmi_status, body_fat, seed, compact):
+        # meal dicts are only built here, once, for the accepted attempt
+        if compact:
+            meals = self._meal_records(np.asarray(picks), np.asarray(portions))
+            return CompactPlan(meals, calories, limits, bmi_status, body_fat, seed, self._cols)
+        meals, totals = self._build_meals(picks, portions)
+        return self._summary(meals, calories, totals, limits, bmi_status, body_fat, seed)
+
+    def _meal_records(self, picks, portions):
+        # picks / portions of shape (..., meals) -> MEAL_DTYPE records
+        cols = self._cols
+        records = np.empty(picks.shape, dtype=MEAL_DTYPE)
+        records["food"] = picks
+        records["portion_g"] = portions
+        records["kcal"] = (cols["kcal"][picks] * portions / 100).astype(int)
+        for col in ["prot", "carb", "fat"]:
+            records[col] = cols[col][picks] * portions / 100
+        return records
+
+    def _summary(self, meals, calories, totals, limits, bmi_status, body_fat, seed=None):
+        total_cal, total_prot, total_carb, total_fat = totals
+        min_fat, max_fat, min_protein = limits
         return {
             "meals": meals,
             "target_calories": calories,
@@ -189,5 +543,448 @@ class SimpleINDBDiet:
             "fat_range": f"{round(min_fat,1)}–{round(max_fat,1)} g",
             "bmi": bmi_status[0],
             "bmi_status": bmi_status[1],
-            "body_fat": body_fat
+            "body_fat": body_fat,
+            "constraints_met": bool(min_fat <= total_fat <= max_fat and total_prot >= min_protein),
+            "seed": seed
+        }
+
+    def _build_meals(self, rows, portions):
+        cols = self._cols
+        meals = {}
+        total_prot = total_carb = total_fat = total_cal = 0
+
+        for meal, best, portion in zip(MEALS, rows, portions):
+            portion = int(portion)
+            kcal = int(cols["kcal"][best] * portion / 100)
+            prot = cols["prot"][best] * portion / 100
+            carb = cols["carb"][best] * portion / 100
+            fat = cols["fat"][best] * portion / 100
+
+            meals[meal] = {
+                "food": str(cols["name"][best])[:25],
+                "type": cols["category"][best],
+                "portion_g": portion,
+                "total_kcal": kcal,
+                "prot_g": round(prot, 1),
+                "carb_g": round(carb, 1),
+                "fat_g": round(fat, 1)
+            }
+
+            total_cal += kcal
+            total_prot += prot
+            total_carb += carb
+            total_fat += fat
+
+        return meals, (total_cal, total_prot, total_carb, total_fat)
+
+    # ---------------- EXACT SOLVER ---------------- #
+
+    def _solve(self, preference, allergy, targets, limits, windows=(12, 24)):
+        # deterministic alternative to the random retry loop: for each meal take
+        # the `width` foods closest in kcal to its target (binary search on the
+        # kcal-sorted pool), then score every combination at once and keep the
+        # one with the smallest calorie deviation that meets the macro limits.
+        # When no window has such a combination, _repair() searches the whole
+        # pool before the plan is called infeasible.
+        min_fat, max_fat, min_protein = limits
+        order, sorted_kcal = self.foods_by_kcal(preference, allergy)
+        cols = self._cols
+
+        for width in windows:
+            width = min(width, len(order))
+            cands = []
+            for target in targets:
+                i = np.searchsorted(sorted_kcal, target)
+                lo = max(0, min(i - width // 2, len(order) - width))
+                cands.append(order[lo:lo + width])
+            cands = np.stack(cands)                                          # (meals, width)
+
+            portion = np.clip((targets[:, None] * 100 / cols["kcal"][cands]).astype(int), 100, 400)
+            kcal = (cols["kcal"][cands] * portion / 100).astype(int)
+            fat = cols["fat"][cands] * portion / 100
+            prot = cols["prot"][cands] * portion / 100
+            dev = np.abs(kcal - targets[:, None])
+
+            # broadcast each meal along its own axis -> (width,) * meals
+            def combine(x):
+                total = 0
+                for m in range(len(MEALS)):
+                    shape = [1] * len(MEALS)
+                    shape[m] = width
+                    total = total + x[m].reshape(shape)
+                return total
+
+            total_fat = combine(fat)
+            total_prot = combine(prot)
+            ok = (min_fat <= total_fat) & (total_fat <= max_fat) & (total_prot >= min_protein)
+            if not ok.any():
+                continue
+
+            best = np.unravel_index(np.where(ok, combine(dev), np.inf).argmin(), ok.shape)
+            meals = np.arange(len(MEALS))
+            return cands[meals, best], portion[meals, best]
+
+        start = np.clip(np.searchsorted(sorted_kcal, targets), 0, len(order) - 1)
+        found = self._repair(order, targets, limits, start)
+        if found is not None:
+            metrics.incr("plan.repaired")
+            return found
+        raise InfeasiblePlanError(
+            f"No {preference}/{allergy} plan found that meets fat {round(min_fat,1)}–{round(max_fat,1)} g"
+            f" and protein >= {round(min_protein,1)} g"
+        )
+
+    def _repair(self, pool, targets, limits, current, rounds=16):
+        # start from the foods closest in kcal and swap one meal per round for
+        # the food in the whole pool that leaves the fewest grams of fat /
+        # protein outside the limits (smallest calorie deviation on ties);
+        # stops when the limits are met or no swap gets closer
+        min_fat, max_fat, min_protein = limits
+        cols = self._cols
+        portion = np.clip((targets[:, None] * 100 / cols["kcal"][pool]).astype(int), 100, 400)
+        kcal = (cols["kcal"][pool] * portion / 100).astype(int)
+        fat = cols["fat"][pool] * portion / 100                           # (meals, pool)
+        prot = cols["prot"][pool] * portion / 100
+        dev = np.abs(kcal - targets[:, None])
+        meals = np.arange(len(MEALS))
+        current = np.array(current)
+
+        def miss(total_fat, total_prot):
+            return (np.maximum(min_fat - total_fat, 0) + np.maximum(total_fat - max_fat, 0)
+                    + np.maximum(min_protein - total_prot, 0))
+
+        for _ in range(rounds):
+            total_fat, total_prot = fat[meals, current].sum(), prot[meals, current].sum()
+            now = miss(total_fat, total_prot)
+            if now == 0:
+                return pool[current], portion[meals, current]
+            # totals with meal m swapped for food j, for every (m, j)
+            swap_miss = miss(total_fat - fat[meals, current][:, None] + fat,
+                             total_prot - prot[meals, current][:, None] + prot)
+            swap_dev = dev[meals, current].sum() - dev[meals, current][:, None] + dev
+            best = np.lexsort((swap_dev.ravel(), swap_miss.ravel()))[0]
+            if swap_miss.ravel()[best] >= now:
+                return None
+            meal, food = np.unravel_index(best, swap_miss.shape)
+            current[meal] = food
+        if miss(fat[meals, current].sum(), prot[meals, current].sum()) == 0:
+            return pool[current], portion[meals, current]
+        return None
+
+    # ---------------- BATCH PLANNING ---------------- #
+
+    def plan_batch(self, profiles, attempts=60, sample_size=30, chunk_size=512, seed=None,
+                   compact=False):
+        # profiles: DataFrame or list of dicts with the same fields plan() takes
+        # (age, gender, weight, height, activity, goal, preference, allergy;
+        # bmi_status / body_fat / neck / waist are optional). compact=True
+        # returns one PlanBatch instead of a list of dicts.
+        if isinstance(profiles, pd.DataFrame):
+            records = profiles.to_dict("records")
+        else:
+            records = list(profiles)
+        if not records:
+            return []
+        metrics.incr("plan_batch.plans", len(records))
+        seed, rng = make_rng(seed)
+
+        body = self.body_metrics(pd.DataFrame.from_records(records))
+        invalid = np.flatnonzero(body["calories"].isna().to_numpy())
+        if len(invalid):
+            raise ValueError(f"invalid age/weight/height in profiles {invalid[:10].tolist()}")
+        calories = body["calories"].to_numpy().astype(int)
+        targets = calories[:, None] * MEAL_SHARES[None, :]
+        limits = np.array([self._macro_limits(r.get("goal"), r["weight"]) for r in records])
+
+        # users sharing a preference/allergy share one candidate pool
+        groups = {}
+        for i, r in enumerate(records):
+            groups.setdefault((r.get("preference"), r.get("allergy")), []).append(i)
+
+        chosen = np.empty((len(records), len(MEALS)), dtype=np.int64)
+        with metrics.timer("plan_batch.sampling"):
+            self._batch_select(groups, targets, limits, chosen, attempts, sample_size, chunk_size, rng)
+
+        portion = np.clip((targets * 100 / self._cols["kcal"][chosen]).astype(int), 100, 400)
+        bmi = body["bmi"].to_numpy()
+        status = body["bmi_status"].to_numpy()
+        body_fat = body["body_fat"].to_numpy()
+        if compact:
+            return self._batch_compact(records, chosen, portion, calories, limits, bmi, status, body_fat, seed)
+        return [
+            self._batch_result(r, chosen[i], portion[i], int(calories[i]), limits[i],
+                               (bmi[i], status[i]), None if np.isnan(body_fat[i]) else body_fat[i], seed)
+            for i, r in enumerate(records)
+        ]
+
+    def _batch_compact(self, records, chosen, portion, calories, limits, bmi, status, body_fat, seed):
+        plans = np.empty(len(records), dtype=PLAN_DTYPE)
+        plans["target_calories"] = calories
+        plans["min_fat"], plans["max_fat"], plans["min_protein"] = limits.T
+        plans["bmi"] = bmi
+        plans["bmi_status"] = pd.Categorical(status, categories=BMI_STATUSES).codes
+        plans["body_fat"] = body_fat
+        plans["seed"] = seed
+
+        # values given in the profiles win, as in the dict form
+        for i, r in enumerate(records):
+            if r.get("bmi_status"):
+                plans["bmi"][i] = r["bmi_status"][0]
+                plans["bmi_status"][i] = BMI_STATUSES.index(r["bmi_status"][1])
+            if r.get("body_fat") is not None:
+                plans["body_fat"][i] = r["body_fat"]
+        return PlanBatch(self._meal_records(chosen, portion), plans, self._cols)
+
+    def _batch_select(self, groups, targets, limits, chosen, attempts, sample_size, chunk_size, rng):
+        kcal, prot, fat = self._cols["kcal"], self._cols["prot"], self._cols["fat"]
+        for (preference, allergy), members in groups.items():
+            pool = self.food_positions(preference, allergy)
+            k = min(sample_size, len(pool))
+
+            for start in range(0, len(members), chunk_size):
+                users = np.asarray(members[start:start + chunk_size])
+                t = targets[users][:, None, :]                                  # (u, 1, meals)
+
+                # (users, attempts, meals, k) random candidates, closest kcal wins
+                picks = pool[rng.integers(0, len(pool), size=(len(users), attempts, len(MEALS), k))]
+                best = np.abs(kcal[picks] - t[..., None]).argmin(axis=-1)
+                best = np.take_along_axis(picks, best[..., None], axis=-1)[..., 0]
+
+                portion = np.clip((t * 100 / kcal[best]).astype(int), 100, 400)
+                total_fat = (fat[best] * portion / 100).sum(axis=-1)
+                total_prot = (prot[best] * portion / 100).sum(axis=-1)
+
+                lo, hi, min_p = limits[users].T
+                ok = (lo[:, None] <= total_fat) & (total_fat <= hi[:, None]) & (total_prot >= min_p[:, None])
+
+                # first attempt meeting the constraints, else the last one (same as plan())
+                attempt = np.where(ok.any(axis=1), ok.argmax(axis=1), attempts - 1)
+                chosen[users] = best[np.arange(len(users)), attempt]
+                metrics.incr("plan_batch.constraint_failures", int((~ok.any(axis=1)).sum()))
+
+    def _batch_result(self, profile, codes, portions, calories, limits, bmi_status, body_fat, seed):
+        meals, totals = self._build_meals(codes, portions)
+        bmi_status = profile.get("bmi_status") or (float(bmi_status[0]), bmi_status[1])
+        if profile.get("body_fat") is not None:
+            body_fat = profile["body_fat"]
+        elif body_fat is not None:
+            body_fat = float(body_fat)
+        # the seed of the whole batch: the same profiles and seed give the same plans
+        return self._summary(meals, calories, totals, tuple(limits), bmi_status, body_fat, seed)
+
+    # ---------------- MULTI-DAY PLANNING ---------------- #
+
+    def plan_days(self, age, gender, weight, height, bmi_status, body_fat,
+        neck, waist, activity, goal, preference, allergy, days=7, variety=2, seed=None):
+        # N days in one pass over a single filtered candidate pool. A food
+        # eaten in the last `variety` days is not offered again, and a day
+        # that cannot meet the macro limits on its own is chosen to pull the
+        # running average back inside them.
+        if days < 1:
+            raise ValueError(f"days must be at least 1, got {days}")
+        metrics.incr("plan_days.calls")
+        metrics.incr("plan_days.days", days)
+        seed, rng = make_rng(seed)
+        profile = {
+            "age": age, "gender": gender, "weight": weight, "height": height,
+            "bmi_status": bmi_status, "body_fat": body_fat, "neck": neck, "waist": waist,
+            "activity": activity, "goal": goal, "preference": preference, "allergy": allergy
         }
+        pool, targets, limits = self._day_inputs(profile)
+
+        picks = np.empty((days, len(MEALS)), dtype=np.int64)
+        portions = np.empty((days, len(MEALS)), dtype=np.int64)
+        with metrics.timer("plan_days.sampling"):
+            for day in range(days):
+                blocked = picks[max(0, day - variety):day].ravel()
+                picks[day], portions[day] = self._sample_day(
+                    rng, pool, targets, limits, blocked, picks[:day], portions[:day]
+                )
+
+        return self._week_result(profile, picks, portions, variety, seed)
+
+    def plan_week(self, *args, **kwargs):
+        return self.plan_days(*args, days=7, **kwargs)
+
+    def replan_day(self, week, day, seed=None):
+        # new foods for one day; the other days are kept as they are
+        return self._replan(week, day, (), seed)
+
+    def replan_meal(self, week, day, meal, seed=None):
+        # new food for one meal; the rest of the week is kept as it is
+        if meal not in MEALS:
+            raise ValueError(f"unknown meal {meal!r}, expected one of {', '.join(MEALS)}")
+        keep = [i for i, m in enumerate(MEALS) if m != meal]
+        return self._replan(week, day, keep, seed)
+
+    def _replan(self, week, day, fixed, seed):
+        metrics.incr("plan_days.replans")
+        seed, rng = make_rng(seed)
+        state = week["state"]
+        profile, variety = state["profile"], state["variety"]
+        picks = np.array(state["picks"], dtype=np.int64)
+        portions = np.array(state["portions"], dtype=np.int64)
+        pool, targets, limits = self._day_inputs(profile)
+
+        others = np.arange(len(picks)) != day
+        near = others & (np.abs(np.arange(len(picks)) - day) <= variety)
+        blocked = np.concatenate([picks[near].ravel(), picks[day, list(fixed)]])
+        # the foods being replaced never come back, even when variety is dropped
+        replaced = np.delete(picks[day], list(fixed))
+
+        with metrics.timer("plan_days.replan"):
+            picks[day], portions[day] = self._sample_day(
+                rng, pool, targets, limits, blocked, picks[others], portions[others],
+                fixed=(list(fixed), picks[day], portions[day]), exclude=replaced
+            )
+        # the week keeps its seed; the replan's own seed is kept with it
+        result = self._week_result(profile, picks, portions, variety, week["seed"])
+        result["state"]["replans"] = state.get("replans", []) + [[day, list(fixed), seed]]
+        return result
+
+    def _day_inputs(self, profile):
+        p = profile
+        calories = self.bmr(p["age"], p["gender"], p["weight"], p["height"], p["activity"], p["goal"])
+        pool = self.food_positions(p["preference"], p["allergy"])
+        return pool, calories * MEAL_SHARES, np.array(self._macro_limits(p["goal"], p["weight"]))
+
+    def _sample_day(self, rng, pool, targets, limits, blocked, done_picks, done_portions,
+                    attempts=60, sample_size=30, fixed=None, exclude=None):
+        kcal, prot, fat = self._cols["kcal"], self._cols["prot"], self._cols["fat"]
+        if exclude is not None and len(exclude):
+            rest = pool[~np.isin(pool, exclude)]
+            pool = rest if len(rest) else pool
+
+        # variety is dropped rather than leaving too few foods to choose from
+        fresh = pool[~np.isin(pool, blocked)] if len(blocked) else pool
+        if len(fresh) < sample_size:
+            fresh = pool
+
+        # (attempts, meals, k) random candidates, closest kcal per meal wins
+        cand = fresh[rng.integers(0, len(fresh), size=(attempts, len(MEALS), sample_size))]
+        dist = np.abs(kcal[cand] - targets[None, :, None]).astype(float)
+        best = np.full((attempts, len(MEALS)), -1, dtype=np.int64)
+        keep = []
+        if fixed is not None:
+            keep, keep_picks, keep_portions = fixed
+            best[:, keep] = keep_picks[keep]
+        attempt_rows = np.arange(attempts)
+        for m in range(len(MEALS)):
+            if m in keep:
+                continue
+            # a food already on the day's plan is not offered to later meals
+            dist[:, m][(cand[:, m, :, None] == best[:, None, :]).any(axis=-1)] = np.inf
+            best[:, m] = cand[attempt_rows, m, dist[:, m].argmin(axis=-1)]
+        portion = np.clip((targets * 100 / kcal[best]).astype(int), 100, 400)
+        if fixed is not None:
+            portion[:, keep] = keep_portions[keep]
+
+        day_fat = (fat[best] * portion / 100).sum(axis=-1)
+        day_prot = (prot[best] * portion / 100).sum(axis=-1)
+        min_fat, max_fat, min_protein = limits
+        ok = (min_fat <= day_fat) & (day_fat <= max_fat) & (day_prot >= min_protein)
+        if ok.any():
+            attempt = ok.argmax()
+        else:
+            metrics.incr("plan_days.constraint_failures")
+            # distance of the running average from the limits if this day is added
+            n = len(done_picks) + 1
+            avg_fat = ((fat[done_picks] * done_portions / 100).sum() + day_fat) / n
+            avg_prot = ((prot[done_picks] * done_portions / 100).sum() + day_prot) / n
+            miss = (np.maximum(min_fat - avg_fat, 0) + np.maximum(avg_fat - max_fat, 0)
+                    + np.maximum(min_protein - avg_prot, 0))
+            attempt = miss.argmin()
+        return best[attempt], portion[attempt]
+
+    def _week_result(self, profile, picks, portions, variety, seed):
+        p = profile
+        calories = self.bmr(p["age"], p["gender"], p["weight"], p["height"], p["activity"], p["goal"])
+        limits = self._macro_limits(p["goal"], p["weight"])
+        min_fat, max_fat, min_protein = limits
+
+        plans = []
+        for day_picks, day_portions in zip(picks, portions):
+            meals, totals = self._build_meals(day_picks, day_portions)
+            plans.append(self._summary(meals, calories, totals, limits, p["bmi_status"], p["body_fat"], seed))
+
+        average = {
+            key: round(float(np.mean([d[f"total_{key}"] for d in plans])), 1)
+            for key in ["calories", "prot", "carb", "fat"]
+        }
+        return {
+            "days": plans,
+            "target_calories": calories,
+            "average": average,
+            "protein_target": f">= {round(min_protein,1)} g" if min_protein > 0 else None,
+            "fat_range": f"{round(min_fat,1)}–{round(max_fat,1)} g",
+            "constraints_met": bool(min_fat <= average["fat"] <= max_fat and average["prot"] >= min_protein),
+            "distinct_foods": int(len(np.unique(picks))),
+            "seed": seed,
+            # what replan_day / replan_meal need to rebuild a single day
+            "state": {"profile": profile, "variety": variety,
+                      "picks": picks.tolist(), "portions": portions.tolist()}
+        }
+
+
+# ---------------- SHARED PLANNER ---------------- #
+
+# One read-only planner per process, shared by every Flet session. Callers
+# should fetch it with get_planner() per request so a reload is picked up.
+RELOAD_CHECK_S = 5.0
+
+_planner = None
+_planner_lock = threading.Lock()
+_last_check = 0.0
+_reloads = 0
+_sessions = 0
+
+def get_planner(store_dir=STORE_DIR):
+    global _planner, _last_check, _reloads
+    planner = _planner
+    now = time.monotonic()
+    if planner is not None and now - _last_check < RELOAD_CHECK_S:
+        return planner
+
+    with _planner_lock:
+        if _planner is None or source_stamp() != (_planner.store_info["source"], _planner.store_info["source_mtime"]):
+            if _planner is not None:
+                _reloads += 1
+            _planner = SimpleINDBDiet(store_dir)
+        _last_check = now
+        return _planner
+
+def planner_pool(workers):
+    # process pool whose workers memory-map the store built here first, so
+    # the table pages are shared through the OS page cache
+    get_planner()
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_pool_worker)
+
+def _init_pool_worker():
+    metrics.reset()         # a forked worker starts with a copy of the parent's numbers
+    get_planner()
+
+def attach_session():
+    global _sessions
+    with _planner_lock:
+        _sessions += 1
+
+def detach_session():
+    global _sessions
+    with _planner_lock:
+        _sessions = max(0, _sessions - 1)
+
+def planner_stats():
+    planner = get_planner()
+    table_bytes = int(planner.df.memory_usage(deep=True).sum())
+    index_bytes = sum(rows.nbytes for rows in planner.food_index.values())
+    index_bytes += sum(order.nbytes + kcal.nbytes for order, kcal in planner.kcal_index.values())
+    shared = table_bytes + index_bytes
+    return {
+        "source": planner.store_info["source"],
+        "rows": len(planner.df),
+        "sessions": _sessions,
+        "reloads": _reloads,
+        "table_bytes": table_bytes,
+        "index_bytes": index_bytes,
+        "bytes_per_session": shared // max(1, _sessions)
+    }
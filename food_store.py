@@ -0,0 +1,201 @@
+# src/food_store.py
+import os
+import json
+import time
+import shutil
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:         # Windows
+    fcntl = None
+    import msvcrt
+
+# ---------------- FILE SETUP ---------------- #
+
+DATA_DIR = "src/data"
+STORE_DIR = os.path.join(DATA_DIR, "food_store")
+INDB_FILE = os.path.join(DATA_DIR, "INDB.csv")
+
+STORE_VERSION = 2        # 2: synthetic table drawn from one seeded Generator
+COLUMNS = ["code", "name", "kcal", "prot", "carb", "fat", "fiber", "category", "allergens"]
+
+NON_VEG_WORDS = ["chicken", "egg", "fish", "biryani", "mutton", "prawn"]
+ALLERGEN_WORDS = {
+    "egg": ["egg", "omelette"],
+    "milk": ["milk", "paneer", "curd", "yogurt", "ghee", "cheese", "butter", "cream", "lassi", "kheer"],
+    "gluten": ["wheat", "roti", "chapati", "naan", "paratha", "bread", "maida", "suji", "semolina"]
+}
+
+# ---------------- SOURCES ---------------- #
+
+def category_of(name):
+    name = name.lower()
+    return "Non-Veg" if any(x in name for x in NON_VEG_WORDS) else "Veg"
+
+def allergen_of(name):
+    name = name.lower()
+    for allergen, words in ALLERGEN_WORDS.items():
+        if any(w in name for w in words):
+            return allergen
+    return "None"
+
+def synthetic_foods(seed=42):
+    # same table in every process and on every run
+    rng = np.random.default_rng(seed)
+    foods = []
+    indian_foods = ["Chicken Curry", "Egg Bhurji", "Fish Fry", "Paneer Tikka",
+                    "Dal Makhani", "Rice", "Roti", "Idli Sambhar", "Dosa",
+                    "Apple", "Boiled Egg", "Yogurt", "Chicken Biryani",
+                    "Mutton Korma", "Prawn Masala"]
+
+    for i in range(1014):
+        food = str(rng.choice(indian_foods)) + f" #{i}"
+        foods.append({
+            'code': i+1,
+            'name': food,
+            'kcal': int(rng.integers(80, 450)),
+            'prot': rng.uniform(3, 25),
+            'carb': rng.uniform(10, 70),
+            'fat': rng.uniform(2, 20),
+            'fiber': rng.uniform(0, 8),
+            'category': category_of(food),
+            'allergens': str(rng.choice(['None', 'milk', 'egg', 'gluten']))
+        })
+    return pd.DataFrame(foods)
+
+def indb_foods(path=INDB_FILE):
+    # Indian Nutrient Databank export (one row per recipe, values per 100 g)
+    raw = pd.read_csv(path)
+    names = raw["food_name"].astype(str)
+    return pd.DataFrame({
+        "code": np.arange(1, len(raw) + 1),
+        "name": names,
+        "kcal": raw["energy_kcal"].fillna(0).round().astype(int),
+        "prot": raw["protein_g"].fillna(0).astype(float),
+        "carb": raw["carb_g"].fillna(0).astype(float),
+        "fat": raw["fat_g"].fillna(0).astype(float),
+        "fiber": raw["fibre_g"].fillna(0).astype(float),
+        "category": [category_of(n) for n in names],
+        "allergens": [allergen_of(n) for n in names]
+    }).query("kcal > 0").reset_index(drop=True)
+
+def source_stamp(indb_file=INDB_FILE):
+    if indb_file and os.path.exists(indb_file):
+        return "indb", os.path.getmtime(indb_file)
+    return "synthetic", None
+
+# ---------------- COLUMNAR STORE ---------------- #
+
+@contextmanager
+def store_lock(store_dir=STORE_DIR, exclusive=True):
+    # readers hold it shared while they check and map the store, a builder
+    # holds it exclusive while it swaps a new one in (Windows: always exclusive)
+    os.makedirs(os.path.dirname(os.path.abspath(store_dir)), exist_ok=True)
+    with open(f"{store_dir}.lock", "a+b") as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        else:
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.05)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+def build_store(df, store_dir=STORE_DIR, source="synthetic", source_mtime=None):
+    # one .npy per column, written to a temp dir and swapped in so other
+    # processes never see a half-written store. Call it under
+    # store_lock(store_dir): the live store is only moved aside once the new
+    # one is complete, and removed after the swap.
+    tmp_dir = f"{store_dir}.tmp-{os.getpid()}"
+    if os.path.exists(tmp_dir):
+        shutil.rmtree(tmp_dir)
+    os.makedirs(tmp_dir)
+
+    for col in COLUMNS:
+        values = df[col].to_numpy()
+        if values.dtype == object or not np.issubdtype(values.dtype, np.number):
+            values = values.astype(str)
+        np.save(os.path.join(tmp_dir, f"{col}.npy"), values)
+
+    with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "version": STORE_VERSION,
+            "source": source,
+            "source_mtime": source_mtime,
+            "rows": len(df),
+            "columns": COLUMNS,
+            "built_at": time.time()
+        }, f, indent=4)
+
+    old_dir = None
+    if os.path.exists(store_dir):
+        old_dir = f"{store_dir}.old-{os.getpid()}"
+        if os.path.exists(old_dir):
+            shutil.rmtree(old_dir)
+        os.replace(store_dir, old_dir)
+    os.replace(tmp_dir, store_dir)
+    if old_dir:
+        # processes that mapped the old files keep their pages (POSIX)
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+def read_meta(store_dir=STORE_DIR):
+    try:
+        with open(os.path.join(store_dir, "meta.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def load_store(store_dir=STORE_DIR, mmap=True):
+    # numeric columns stay memory-mapped read-only, so every process that
+    # opens the store shares the same pages
+    mode = "r" if mmap else None
+    cols = {col: np.load(os.path.join(store_dir, f"{col}.npy"), mmap_mode=mode) for col in COLUMNS}
+    return pd.DataFrame(cols, copy=False)
+
+def store_is_fresh(store_dir=STORE_DIR, indb_file=INDB_FILE):
+    meta = read_meta(store_dir)
+    if not meta or meta.get("version") != STORE_VERSION:
+        return False
+    source, mtime = source_stamp(indb_file)
+    return meta.get("source") == source and meta.get("source_mtime") == mtime
+
+def open_food_table(store_dir=STORE_DIR, indb_file=INDB_FILE):
+    start = time.perf_counter()
+    source, mtime = source_stamp(indb_file)
+    built = False
+
+    if store_dir is None:
+        df = indb_foods(indb_file) if source == "indb" else synthetic_foods()
+    else:
+        with store_lock(store_dir, exclusive=False):
+            df = load_store(store_dir) if store_is_fresh(store_dir, indb_file) else None
+        if df is None:
+            with store_lock(store_dir):
+                # another process may have built it while we waited
+                if not store_is_fresh(store_dir, indb_file):
+                    table = indb_foods(indb_file) if source == "indb" else synthetic_foods()
+                    build_store(table, store_dir, source, mtime)
+                    built = True
+                df = load_store(store_dir)
+
+    info = {
+        "source": source,
+        "source_mtime": mtime,
+        "store_dir": store_dir,
+        "built": built,
+        "rows": len(df),
+        "cold_start_s": round(time.perf_counter() - start, 4)
+    }
+    return df, info
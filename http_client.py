@@ -0,0 +1,214 @@
+# src/http_client.py
+import time
+import threading
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+
+# ---------------- SETTINGS ---------------- #
+
+HEADERS = {"User-Agent": "INDB-Diet-Pro/1.0"}
+TIMEOUT_S = 6
+POOL_SIZE = 10                  # keep-alive connections per host
+MAX_PER_HOST = 4                # concurrent requests per host
+RETRIES = 2
+BACKOFF_S = 0.3
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+SLOT_POLL_S = 0.05              # how often a cancellable request waiting for a slot checks
+BREAKER_FAILURES = 5            # consecutive failures before a host is skipped
+BREAKER_RESET_S = 30            # how long it is skipped before one trial request
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 6000, float("inf"))
+
+class CircuitOpenError(requests.RequestException):
+    pass
+
+class HostBusyError(requests.RequestException):
+    pass
+
+class RequestCancelled(requests.RequestException):
+    pass
+
+# ---------------- CIRCUIT BREAKER ---------------- #
+
+class CircuitBreaker:
+    def __init__(self, failures=BREAKER_FAILURES, reset_s=BREAKER_RESET_S):
+        self.failures = failures
+        self.reset_s = reset_s
+        self.state = "closed"
+        self._errors = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_s:
+                self.state = "half-open"    # let one request probe the host
+                return True
+            return self.state == "closed"
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self._errors = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._errors += 1
+            if self.state == "half-open" or self._errors >= self.failures:
+                self.state = "open"
+                self._opened_at = time.monotonic()
+
+    def abandon(self):
+        # the request ended without a result (busy host, unexpected error):
+        # a half-open probe gives its turn back, the next one comes after
+        # another reset_s instead of never
+        with self._lock:
+            if self.state == "half-open":
+                self.state = "open"
+                self._opened_at = time.monotonic()
+
+# ---------------- LATENCY HISTOGRAM ---------------- #
+
+class LatencyHistogram:
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total_ms = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, ms):
+        with self._lock:
+            self.count += 1
+            self.total_ms += ms
+            for i, bound in enumerate(self.buckets):
+                if ms <= bound:
+                    self.counts[i] += 1
+                    break
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "count": self.count,
+                "mean_ms": round(self.total_ms / self.count, 2) if self.count else 0.0,
+                "buckets": {("+Inf" if b == float("inf") else str(b)): c for b, c in zip(self.buckets, self.counts)}
+            }
+
+# ---------------- CLIENT ---------------- #
+
+class HttpClient:
+    # one pooled keep-alive session shared by all lookups, with per-host
+    # concurrency limits, retries with backoff and a breaker per host.
+    # get(cancel=event) stops once the event is set: while waiting for a
+    # slot, before a retry or during its backoff. An attempt already sent
+    # still runs to its timeout, so a cancelled request holds its slot for
+    # at most one timeout instead of timeout * (retries + 1).
+
+    def __init__(self, timeout_s=TIMEOUT_S, max_per_host=MAX_PER_HOST, retries=RETRIES):
+        self.timeout_s = timeout_s
+        self.max_per_host = max_per_host
+        self.retries = retries
+
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        # retries are done in _send(), where a cancelled request can stop
+        adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _host(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = {
+                    "slots": threading.BoundedSemaphore(self.max_per_host),
+                    "breaker": CircuitBreaker(),
+                    "latency": LatencyHistogram(),
+                    "errors": 0
+                }
+            return host, self._hosts[host]
+
+    def get(self, url, cancel=None, **kwargs):
+        host, state = self._host(url)
+        breaker = state["breaker"]
+        if not breaker.allow():
+            raise CircuitOpenError(f"{host} is unavailable, skipping")
+
+        recorded = False
+        try:
+            self._acquire(state["slots"], host, cancel)
+            start = time.perf_counter()
+            try:
+                kwargs.setdefault("timeout", self.timeout_s)
+                res = self._send(url, cancel, kwargs)
+            except RequestCancelled:
+                raise
+            except requests.RequestException:
+                state["errors"] += 1
+                breaker.record_failure()
+                recorded = True
+                raise
+            finally:
+                state["slots"].release()
+                state["latency"].observe((time.perf_counter() - start) * 1000)
+
+            if res.status_code >= 500:
+                state["errors"] += 1
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            recorded = True
+            return res
+        finally:
+            if not recorded:
+                breaker.abandon()
+
+    def _acquire(self, slots, host, cancel):
+        deadline = time.monotonic() + self.timeout_s
+        while True:
+            if cancel is not None and cancel.is_set():
+                raise RequestCancelled(f"request to {host} cancelled")
+            if slots.acquire(timeout=self.timeout_s if cancel is None else SLOT_POLL_S):
+                return
+            if time.monotonic() >= deadline:
+                raise HostBusyError(f"too many requests in flight to {host}")
+
+    def _send(self, url, cancel, kwargs):
+        # GET with up to self.retries retries on connection errors and
+        # RETRY_STATUSES; the last response is returned whatever its status
+        for attempt in range(self.retries + 1):
+            if cancel is not None and cancel.is_set():
+                raise RequestCancelled(f"request to {url} cancelled")
+            try:
+                res = self.session.get(url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.retries:
+                    raise
+            else:
+                if res.status_code not in RETRY_STATUSES or attempt == self.retries:
+                    return res
+                res.close()
+            # no wait before the first retry, then BACKOFF_S doubling
+            delay = BACKOFF_S * 2 ** attempt if attempt else 0
+            if cancel is not None:
+                if cancel.wait(delay):
+                    raise RequestCancelled(f"request to {url} cancelled")
+            else:
+                time.sleep(delay)
+
+    def stats(self):
+        with self._lock:
+            hosts = dict(self._hosts)
+        return {
+            host: {
+                "breaker": state["breaker"].state,
+                "errors": state["errors"],
+                "latency": state["latency"].snapshot()
+            }
+            for host, state in hosts.items()
+        }
+
+client = HttpClient()
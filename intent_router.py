@@ -0,0 +1,134 @@
+# src/intent_router.py
+import os
+import re
+import json
+import threading
+
+# ---------------- KEYWORD MATCHER ---------------- #
+
+def _trie_pattern(node, whole_word):
+    # longer continuations are tried before the end of a keyword, so the
+    # regex prefers the longest keyword starting at each position
+    alts = [re.escape(ch) + _trie_pattern(child, whole_word)
+            for ch, child in sorted(node.items()) if ch]
+    if "" in node:
+        alts.append(r"(?![a-z])" if whole_word else "")
+    return alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+
+class KeywordMatcher:
+    # many keywords compiled into a single trie-shaped regex, so a message is
+    # scanned once instead of once per keyword. Whole-word keywords must not
+    # touch other letters ("sin" matches "sin 30" / "sin(x)", not "using").
+
+    def __init__(self, keywords, whole_words=()):
+        self.keywords = [k.lower() for k in keywords if k]
+        whole_words = {k.lower() for k in whole_words}
+
+        tries = {True: {}, False: {}}
+        for kw in self.keywords:
+            node = tries[kw in whole_words]
+            for ch in kw:
+                node = node.setdefault(ch, {})
+            node[""] = {}
+
+        branches = []
+        if tries[True]:
+            branches.append(r"(?<![a-z])" + _trie_pattern(tries[True], True))
+        if tries[False]:
+            branches.append(_trie_pattern(tries[False], False))
+        self.body = "|".join(branches)
+        # zero-width lookahead so matches may overlap
+        self.pattern = re.compile("(?=(" + self.body + "))") if branches else None
+
+        # a substring keyword that is a prefix of a longer one is hidden by
+        # the longest match, so remember which keywords each one implies
+        self._implied = {
+            kw: [k for k in self.keywords if k != kw and kw.startswith(k) and k not in whole_words]
+            for kw in self.keywords
+        }
+
+    def find(self, text):
+        found = set()
+        if self.pattern is None:
+            return found
+        for m in self.pattern.finditer(text.lower()):
+            kw = m.group(1)
+            if kw:
+                found.add(kw)
+                found.update(self._implied[kw])
+        return found
+
+# ---------------- INTENTS ---------------- #
+
+# checked in this order, first intent found wins
+INTENT_KEYWORDS = [
+    ("SMALL_TALK", ["hi", "hello", "hey"]),
+    ("MATH", ["sin", "cos", "area", "derivative"]),
+    ("TECH", ["python", "java", "c++", "programming"]),
+    ("PERSONAL", ["my name", "my age", "my birth"])
+]
+WHOLE_WORD_INTENTS = {"SMALL_TALK", "MATH"}
+
+# operators only count between operands: "5 - 3", "12/4", "x^2", "(2+3)*4",
+# but not "gluten-free", "veg/non-veg" or "c++"
+MATH_EXPR = re.compile(r"[\d)]\s*[-+*/^%]\s*[\d(.]|\b[a-z]\s*\^\s*\d|\d\s*[*^]\s*[a-z]\b")
+
+_intent_of = {kw: intent for intent, kws in INTENT_KEYWORDS for kw in kws}
+_intent_matcher = KeywordMatcher(
+    _intent_of,
+    whole_words=[kw for kw, intent in _intent_of.items() if intent in WHOLE_WORD_INTENTS]
+)
+
+# keywords and math expressions in one regex: a single pass over the message
+# yields every intent signal, a math expression shows up as an empty group
+_router = re.compile(f"({_intent_matcher.body})|{MATH_EXPR.pattern}")
+_rank = {kw: i for i, (_, kws) in enumerate(INTENT_KEYWORDS) for kw in kws}
+_MATH_RANK = [intent for intent, _ in INTENT_KEYWORDS].index("MATH")
+
+def detect_intent(msg):
+    # msg is expected lower-cased, as get_smart_response passes it
+    best = len(INTENT_KEYWORDS)
+    for kw in _router.findall(msg):
+        rank = _rank.get(kw, _MATH_RANK)
+        if rank < best:
+            best = rank
+    return INTENT_KEYWORDS[best][0] if best < len(INTENT_KEYWORDS) else "FACT"
+
+# ---------------- PROGRAMMING ANSWERS ---------------- #
+
+class ProgrammingAnswers:
+    # programming.json loaded once and reloaded only when the file changes
+
+    def __init__(self, path):
+        self.path = path
+        self._mtime = None
+        self._state = ([], {}, KeywordMatcher([]))     # answers, key order, matcher
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            mtime = None
+        if mtime == self._mtime:
+            return
+
+        with self._lock:
+            if mtime == self._mtime:
+                return
+            data = {}
+            if mtime is not None:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            order = {key.lower(): i for i, key in reversed(list(enumerate(data)))}
+            self._state = (list(data.values()), order, KeywordMatcher(data))
+            self._mtime = mtime
+
+    def lookup(self, msg):
+        self._refresh()
+        answers, order, matcher = self._state
+        found = matcher.find(msg)
+        if not found:
+            return None
+        # same answer the old linear scan gave: first matching key in file order
+        return answers[min(order[key] for key in found)]
@@ -0,0 +1,177 @@
+# src/knowledge_base.py
+import re
+import json
+import math
+import time
+import threading
+from collections import defaultdict
+from src import metrics
+
+# ---------------- SETTINGS ---------------- #
+
+MIN_SCORE = 0.8         # share of the question's weight a document must cover
+BODY_WEIGHT = 0.5       # a word only found in the body counts this much
+MIN_TITLE = 0.6         # share of the document title's words the question must contain
+STOPWORDS = frozenset("""a an the of in on at for to and or is are was were what which who how much many
+                         does do did has have contain contains per about me tell give show any some""".split())
+NUTRIENT_WORDS = "calories kcal energy nutrition nutrients macros protein carbs carbohydrates fat fibre fiber"
+
+def words(text):
+    # lowercase words without stopwords, with a plain plural "s" dropped so
+    # "boiled eggs" finds "Boiled Egg"
+    out = []
+    for w in re.findall(r"[a-z0-9]+", str(text).lower()):
+        if w in STOPWORDS:
+            continue
+        if len(w) > 3 and w.endswith("s") and not w.endswith("ss"):
+            w = w[:-1]
+        out.append(w)
+    return out
+
+# ---------------- INDEX ---------------- #
+
+class TextIndex:
+    # word-level inverted index. A document matches when its title (fully)
+    # and body (at BODY_WEIGHT) cover at least min_score of the question's
+    # idf weight, so "calories in paneer tikka" finds Paneer Tikka while
+    # "who is elon musk" finds nothing instead of a loose neighbour. The
+    # question must also name most of the title (MIN_TITLE), so "chicken"
+    # alone is not answered with Chicken Curry. Only the rarest words are
+    # walked for candidates: once the words left could no longer lift an
+    # unseen document to min_score, the walk stops.
+
+    def __init__(self):
+        self._postings = defaultdict(dict)     # word -> {doc id: weight}
+        self._answers = []                     # doc id -> answer text
+        self._title_len = []                   # doc id -> title length, shorter wins ties
+        self._titles = []                      # doc id -> set of title words
+
+    def __len__(self):
+        return len(self._answers)
+
+    def add(self, title, body, answer):
+        doc = len(self._answers)
+        weights = dict.fromkeys(words(body), BODY_WEIGHT)
+        weights.update(dict.fromkeys(words(title), 1.0))
+        for w, weight in weights.items():
+            self._postings[w][doc] = weight
+        self._answers.append(answer)
+        self._title_len.append(len(title))
+        self._titles.append(frozenset(words(title)))
+
+    def search(self, query, min_score=MIN_SCORE, min_title=MIN_TITLE):
+        query = set(words(query))
+        if not query or not self._answers:
+            return None, 0.0
+        n = len(self._answers)
+        idf = {w: math.log(1 + n / (1 + len(self._postings.get(w, ())))) for w in query}
+        total = sum(idf.values())
+
+        candidates, left = set(), total
+        for w in sorted(query, key=idf.get, reverse=True):
+            if left < min_score * total:
+                break
+            candidates.update(self._postings.get(w, ()))
+            left -= idf[w]
+
+        best, best_key = None, None
+        for doc in candidates:
+            title = self._titles[doc]
+            if not title or len(title & query) < min_title * len(title):
+                continue
+            score = sum(self._postings[w].get(doc, 0.0) * idf[w] for w in query if w in self._postings)
+            key = (score, -self._title_len[doc], -doc)
+            if best_key is None or key > best_key:
+                best, best_key = doc, key
+
+        if best is None or best_key[0] / total < min_score:
+            return None, best_key[0] / total if best_key else 0.0
+        return self._answers[best], best_key[0] / total
+
+# ---------------- KNOWLEDGE BASE ---------------- #
+
+def food_answer(name, category, kcal, prot, carb, fat, fiber, allergens):
+    icon = "🥬" if category == "Veg" else "🍗"
+    answer = (f"{icon} {name} ({category}), per 100 g: 🔥 {int(kcal)} kcal | 💪 protein {prot:.1f} g | "
+              f"🍞 carbs {carb:.1f} g | 🧈 fat {fat:.1f} g | 🌾 fiber {fiber:.1f} g")
+    if str(allergens).lower() != "none":
+        answer += f" | ⚠️ contains {str(allergens).lower()}"
+    return answer
+
+class KnowledgeBase:
+    # offline answers for the chatbot's FACT path: one document per food in
+    # the planner's table plus, when articles_file exists, one per line of a
+    # JSONL article dump ({"title": ..., "text": ...}, e.g. Wikipedia
+    # abstracts). Built on the first search and again after the planner
+    # reloads its table.
+
+    def __init__(self, articles_file=None, planner=None):
+        self.articles_file = articles_file
+        self._planner = planner             # callable returning the planner, get_planner by default
+        self._index = None
+        self._stamp = None
+        self._lock = threading.Lock()
+        self.stats = {"foods": 0, "articles": 0, "bad_lines": 0, "build_ms": 0.0,
+                      "hits": 0, "misses": 0}
+
+    def search(self, query, min_score=MIN_SCORE):
+        answer, _ = self.index().search(query, min_score)
+        self.stats["hits" if answer else "misses"] += 1
+        return answer
+
+    def index(self):
+        planner = self._get_planner()
+        stamp = planner.table_stamp
+        if self._index is not None and stamp == self._stamp:
+            return self._index
+        with self._lock:
+            if self._index is None or stamp != self._stamp:
+                self._index = self._build(planner)
+                self._stamp = stamp
+            return self._index
+
+    def _get_planner(self):
+        if self._planner is None:
+            # imported here so loading the chatbot does not pull in pandas
+            from src.diet_logic import get_planner
+            self._planner = get_planner
+        return self._planner()
+
+    def _build(self, planner):
+        start = time.perf_counter()
+        index = TextIndex()
+        df = planner.df
+        for name, category, kcal, prot, carb, fat, fiber, allergens in zip(
+                df["name"], df["category"], df["kcal"], df["prot"], df["carb"], df["fat"],
+                df["fiber"], df["allergens"]):
+            index.add(str(name), f"{category} {allergens} {NUTRIENT_WORDS}",
+                      food_answer(name, category, kcal, prot, carb, fat, fiber, allergens))
+        self.stats["foods"] = len(index)
+
+        self.stats["articles"] = self.stats["bad_lines"] = 0
+        if self.articles_file:
+            try:
+                with open(self.articles_file, "r", encoding="utf-8") as f:
+                    for line in f:
+                        if line.strip():
+                            self._add_article(index, line)
+            except FileNotFoundError:
+                pass
+            except OSError as ex:
+                metrics.warn("⚠️ ARTICLES:", type(ex).__name__, ex)
+
+        self.stats["build_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        metrics.debug("📚 knowledge base:", self.stats["foods"], "foods,", self.stats["articles"],
+                      "articles in", self.stats["build_ms"], "ms")
+        return index
+
+    def _add_article(self, index, line):
+        try:
+            article = json.loads(line)
+            title, text = str(article["title"]), str(article["text"])
+        except (ValueError, TypeError, KeyError):
+            self.stats["bad_lines"] += 1
+            return
+        if text:
+            index.add(title, text, text)
+            self.stats["articles"] += 1
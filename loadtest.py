@@ -0,0 +1,179 @@
+# src/loadtest.py
+# Load test for the plan service on localhost:
+#   python -m src.loadtest --spawn --concurrency 64 --duration 10
+#   python -m src.loadtest --url http://127.0.0.1:8080 --endpoint bmr --seeded 0.2
+import sys
+import json
+import time
+import asyncio
+import argparse
+import subprocess
+import numpy as np
+from urllib.parse import urlsplit
+from src.benchmarks import sample_profiles
+
+# ---------------- SETTINGS ---------------- #
+
+URL = "http://127.0.0.1:8080"
+CONCURRENCY = 32
+DURATION_S = 10
+PROFILES = 1000
+SPAWN_TIMEOUT_S = 60
+
+# ---------------- CLIENT ---------------- #
+
+class Connection:
+    # one keep-alive connection speaking just enough HTTP/1.1 for the service
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = self.writer = None
+
+    async def request(self, method, path, payload=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        body = json.dumps(payload).encode() if payload is not None else b""
+        self.writer.write(f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+                          f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+        await self.writer.drain()
+
+        status = int((await self.reader.readline()).split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        data = await self.reader.readexactly(int(headers.get("content-length", 0)))
+        if headers.get("connection", "").lower() == "close":
+            self.close()
+        return status, data
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+def payloads(endpoint, n, seeded):
+    rng = np.random.default_rng(1)
+    out = []
+    for i, p in enumerate(sample_profiles(n, seed=11)):
+        if endpoint == "plan" and rng.random() < seeded:
+            p = dict(p, seed=i)
+        out.append(p)
+    return out
+
+async def fetch_json(host, port, path):
+    conn = Connection(host, port)
+    try:
+        status, data = await conn.request("GET", path)
+        return json.loads(data) if status == 200 else None
+    finally:
+        conn.close()
+
+# ---------------- RUN ---------------- #
+
+async def load(url=URL, endpoint="plan", concurrency=CONCURRENCY, duration_s=DURATION_S, seeded=0.0):
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    bodies = payloads(endpoint, PROFILES, seeded)
+    latencies, statuses = [], {}
+    deadline = time.perf_counter() + duration_s
+
+    async def client(k):
+        conn = Connection(host, port)
+        i = k
+        try:
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    status, _ = await conn.request("POST", f"/{endpoint}", bodies[i % len(bodies)])
+                except (OSError, asyncio.IncompleteReadError, ValueError, IndexError):
+                    status = "conn_error"
+                    conn.close()
+                latencies.append(time.perf_counter() - start)
+                statuses[status] = statuses.get(status, 0) + 1
+                i += concurrency
+        finally:
+            conn.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(k) for k in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    ms = np.array(latencies) * 1000
+    ok = statuses.get(200, 0)
+    report = {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "ok": ok,
+        "statuses": {str(k): v for k, v in sorted(statuses.items(), key=str)},
+        "throughput_rps": round(ok / elapsed, 1),
+        "p50_ms": round(float(np.percentile(ms, 50)), 2) if len(ms) else None,
+        "p90_ms": round(float(np.percentile(ms, 90)), 2) if len(ms) else None,
+        "p99_ms": round(float(np.percentile(ms, 99)), 2) if len(ms) else None,
+        "max_ms": round(float(ms.max()), 2) if len(ms) else None,
+    }
+    snapshot = await fetch_json(host, port, "/metrics?format=json")
+    if snapshot:
+        report["service"] = {k.split(".", 1)[1]: v for k, v in snapshot["sources"].items()
+                             if k.startswith("service.")}
+    return report
+
+def spawn(url, workers=None):
+    # starts python -m src.plan_service on the URL's port and waits for /health
+    parts = urlsplit(url)
+    cmd = [sys.executable, "-m", "src.plan_service", "--host", parts.hostname, "--port", str(parts.port or 80)]
+    if workers:
+        cmd += ["--workers", str(workers)]
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL)
+    give_up = time.monotonic() + SPAWN_TIMEOUT_S
+    while time.monotonic() < give_up:
+        if proc.poll() is not None:
+            raise RuntimeError(f"plan service exited with code {proc.returncode}")
+        try:
+            if asyncio.run(fetch_json(parts.hostname, parts.port or 80, "/health")):
+                return proc
+        except OSError:
+            pass
+        time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("plan service did not come up")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the Diet Pro plan service")
+    parser.add_argument("--url", default=URL)
+    parser.add_argument("--endpoint", default="plan", choices=["plan", "bmr", "bmi", "body_fat"])
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    parser.add_argument("--duration", type=float, default=DURATION_S)
+    parser.add_argument("--seeded", type=float, default=0.0,
+                        help="share of plan requests sent with a seed (not micro-batched)")
+    parser.add_argument("--spawn", action="store_true", help="start the service for the run")
+    parser.add_argument("--workers", type=int, default=None, help="service workers with --spawn")
+    parser.add_argument("--output", help="write the report as JSON")
+    args = parser.parse_args(argv)
+
+    proc = spawn(args.url, args.workers) if args.spawn else None
+    try:
+        report = asyncio.run(load(args.url, args.endpoint, args.concurrency, args.duration, args.seeded))
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait()
+
+    print(f"📈 {report['endpoint']}: {report['throughput_rps']:,.1f} req/s | "
+          f"p50 {report['p50_ms']} ms | p90 {report['p90_ms']} ms | p99 {report['p99_ms']} ms | "
+          f"max {report['max_ms']} ms | {report['statuses']}")
+    if "service" in report:
+        print(f"   batches {report['service'].get('batches')} | mean batch {report['service'].get('mean_batch')} "
+              f"| rejected {report['service'].get('rejected')}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
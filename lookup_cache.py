@@ -0,0 +1,123 @@
+# src/lookup_cache.py
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+
+# ---------------- FILE SETUP ---------------- #
+
+DATA_DIR = "src/data"
+CACHE_FILE = os.path.join(DATA_DIR, "lookup_cache.sqlite3")
+
+TTL_S = 7 * 24 * 3600          # found answers
+NEGATIVE_TTL_S = 6 * 3600      # "no result" answers, retried sooner
+MEMORY_SIZE = 512              # entries in the in-process LRU
+MAX_ROWS = 20000               # entries kept on disk
+
+# ---------------- CACHE ---------------- #
+
+class LookupCache:
+    # two tiers: an in-memory LRU in front of a SQLite table; both expire
+    # entries by TTL and a None value is cached as a negative result
+
+    def __init__(self, path=CACHE_FILE, memory_size=MEMORY_SIZE, max_rows=MAX_ROWS,
+                 ttl_s=TTL_S, negative_ttl_s=NEGATIVE_TTL_S):
+        self.path = path
+        self.memory_size = memory_size
+        self.max_rows = max_rows
+        self.ttl_s = ttl_s
+        self.negative_ttl_s = negative_ttl_s
+
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "negative_hits": 0,
+                      "misses": 0, "stores": 0, "evictions": 0}
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS lookups (
+                backend TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT,
+                expires_at REAL NOT NULL,
+                stored_at REAL NOT NULL,
+                PRIMARY KEY (backend, key)
+            )
+        """)
+        self._db.commit()
+
+    def get(self, backend, key):
+        # returns (found, value); value may be None for a cached miss
+        now = time.time()
+        with self._lock:
+            entry = self._lru.get((backend, key))
+            if entry and entry[0] > now:
+                self._lru.move_to_end((backend, key))
+                self._count_hit("memory_hits", entry[1])
+                return True, entry[1]
+
+            row = self._db.execute(
+                "SELECT value, expires_at FROM lookups WHERE backend = ? AND key = ?",
+                (backend, key)
+            ).fetchone()
+            if row and row[1] > now:
+                value = json.loads(row[0])
+                self._remember((backend, key), row[1], value)
+                self._count_hit("disk_hits", value)
+                return True, value
+
+            self.stats["misses"] += 1
+            return False, None
+
+    def put(self, backend, key, value):
+        now = time.time()
+        expires_at = now + (self.ttl_s if value is not None else self.negative_ttl_s)
+        with self._lock:
+            self._remember((backend, key), expires_at, value)
+            self._db.execute(
+                "INSERT OR REPLACE INTO lookups VALUES (?, ?, ?, ?, ?)",
+                (backend, key, json.dumps(value), expires_at, now)
+            )
+            self.stats["stores"] += 1
+            if self.stats["stores"] % 100 == 0:
+                self._evict(now)
+            self._db.commit()
+
+    def cached(self, backend, key, fetch):
+        found, value = self.get(backend, key)
+        if found:
+            return value
+        value = fetch(key)   # exceptions propagate and nothing is cached
+        self.put(backend, key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._lru.clear()
+            self._db.execute("DELETE FROM lookups")
+            self._db.commit()
+
+    def _remember(self, key, expires_at, value):
+        self._lru[key] = (expires_at, value)
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.memory_size:
+            self._lru.popitem(last=False)
+
+    def _count_hit(self, tier, value):
+        self.stats[tier] += 1
+        if value is None:
+            self.stats["negative_hits"] += 1
+
+    def _evict(self, now):
+        # expired rows first, then the oldest rows above max_rows
+        deleted = self._db.execute("DELETE FROM lookups WHERE expires_at <= ?", (now,)).rowcount
+        deleted += self._db.execute("""
+            DELETE FROM lookups WHERE rowid IN (
+                SELECT rowid FROM lookups ORDER BY stored_at DESC LIMIT -1 OFFSET ?
+            )
+        """, (self.max_rows,)).rowcount
+        self.stats["evictions"] += deleted
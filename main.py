@@ -1,5 +1,10 @@
+import os
+import logging
 import flet as ft
 from src.main_app import main
 
+# DIET_PRO_LOG=DEBUG shows the chatbot's per-message trace
+logging.basicConfig(level=os.environ.get("DIET_PRO_LOG", "WARNING"))
+
 if __name__ == "__main__":
     ft.run(main)
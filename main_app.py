@@ -1,6 +1,43 @@
+import sys
+import uuid
+import asyncio
+import threading
+import importlib
+import functools
 import flet as ft
-from src.diet_logic import SimpleINDBDiet
-from src.chatbot import get_smart_response
+from src import metrics
+from src.plan_cache import plan_cache
+from src.chat_view import ChatTranscript
+
+STREAM_WORDS = 6
+STREAM_DELAY_S = 0.03
+CLIENT_ID_KEY = "diet_pro.client_id"     # kept in the browser / device storage
+
+# same order as diet_logic.MEALS, repeated so the dropdown needs no pandas
+SWAP_MEALS = ("breakfast", "lunch", "snack", "dinner")
+
+# substitute search per "Prefer" choice, see SimpleINDBDiet.substitutes
+SWAP_GOALS = {
+    "Similar": {},
+    "Lower fat": {"lower": ("fat",)},
+    "Lower calories": {"lower": ("kcal",)},
+    "Higher protein": {"higher": ("prot",)},
+    "Higher fiber": {"higher": ("fiber",)}
+}
+
+# ---------------- LAZY IMPORTS ----------------
+# diet_logic (pandas/NumPy) and chatbot (network stack, memory store,
+# autocorrect, mathbot) are imported on first use, so the page paints
+# without them; warm_up() loads them in the background after the paint
+PLANNER_MODULE = "src.diet_logic"
+CHATBOT_MODULE = "src.chatbot"
+
+def warm_up(module, then=None):
+    def load():
+        loaded = importlib.import_module(module)
+        if then:
+            getattr(loaded, then)()
+    threading.Thread(target=load, daemon=True).start()
 
 # ---------------- BOT MESSAGE ----------------
 def bot_msg(text):
@@ -12,6 +49,26 @@ def bot_msg(text):
         width=350
     )
 
+def user_msg_bubble(text):
+    return ft.Container(
+        content=ft.Text(f"You: {text}", size=16, color=ft.Colors.BLACK),
+        padding=10,
+        bgcolor=ft.Colors.GREY_200,
+        border_radius=10,
+        width=350
+    )
+
+def chat_message(text, mine):
+    # control.data keeps the raw text so the transcript can page it back
+    control = user_msg_bubble(text) if mine else bot_msg(text)
+    control.data = (text, mine)
+    return control
+
+def read_chat_message(control):
+    text, mine = control.data
+    # bot bubbles are streamed into, their current text is the answer
+    return (text if mine else control.content.value), mine
+
 # ---------------- MAIN ----------------
 def main(page: ft.Page):
     page.title = "Diet Pro"
@@ -21,8 +78,30 @@ def main(page: ft.Page):
     page.scroll = ft.ScrollMode.AUTO
     page.resize_to_avoid_bottom_inset = True
 
-    planner = SimpleINDBDiet()
+    # food table + planner are shared by all sessions in this process; the
+    # session is counted the first time it asks for the planner
+    session_attached = False
+
+    def get_planner():
+        nonlocal session_attached
+        diet_logic = importlib.import_module(PLANNER_MODULE)
+        if not session_attached:
+            diet_logic.attach_session()
+            session_attached = True
+        return diet_logic.get_planner()
+
+    def on_disconnect(e):
+        if session_attached:
+            importlib.import_module(PLANNER_MODULE).detach_session()
+        # the client's chat state in memory is rebuilt from the store when it
+        # comes back; the chatbot is not imported just to drop nothing
+        chatbot = sys.modules.get(CHATBOT_MODULE)
+        if chatbot is not None and chat_user is not None:
+            chatbot.forget_user(chat_user)
+
+    page.on_disconnect = on_disconnect
     plan_count = 0
+    last_plan = None
     chat_input = ft.TextField(label="Type your message", expand=True)
 
     # ---------------- INPUT FIELDS ----------------
@@ -65,6 +144,16 @@ def main(page: ft.Page):
 
     result_text = ft.Text("👆 Fill all fields & click Calculate", size=15)
 
+    swap_meal_dropdown = ft.Dropdown(
+        label="🔄 Swap meal",
+        options=[ft.dropdown.Option(m) for m in SWAP_MEALS]
+    )
+    swap_goal_dropdown = ft.Dropdown(
+        label="🎚️ Prefer",
+        options=[ft.dropdown.Option(x) for x in SWAP_GOALS]
+    )
+    swap_text = ft.Text("", size=15)
+
     # ---------------- FUNCTIONS ----------------
     def reset_fields():
         for f in [age_field, weight_field, height_field, neck_field, waist_field]:
@@ -83,6 +172,7 @@ def main(page: ft.Page):
             waist = float(waist_field.value or 80)
             gender = (gender_dropdown.value or "Male").lower()
 
+            planner = get_planner()
             bmi, status = planner.calculate_bmi(weight, height)
             body_fat, method = planner.navy_body_fat(gender, height, neck, waist)
 
@@ -99,13 +189,14 @@ def main(page: ft.Page):
 🍽️ {pref_dropdown.value}
 ⚠️ {allergy_dropdown.value}
 """
-            page.update()
+            with metrics.timer("ui.render"):
+                page.update()
         except:
             result_text.value = "❌ Invalid inputs"
             page.update()
 
     def generate_plan(e):
-        nonlocal plan_count
+        nonlocal plan_count, last_plan
         plan_count += 1
         try:
             age = float(age_field.value or 25)
@@ -120,14 +211,19 @@ def main(page: ft.Page):
             pref = pref_dropdown.value or "Nonveg"
             allergy = allergy_dropdown.value or "None"
 
+            planner = get_planner()
             bmi, status = planner.calculate_bmi(weight, height)
             body_fat, _ = planner.navy_body_fat(gender, height, neck, waist)
 
-            plan = planner.plan(
-                age, gender, weight, height,
+            # seeded by the click count: every click gives a new plan, and
+            # sessions with the same inputs share them through the cache
+            plan = plan_cache.plan(
+                planner, age, gender, weight, height,
                 (bmi, status), body_fat,
-                neck, waist, activity, goal, pref, allergy
+                neck, waist, activity, goal, pref, allergy,
+                seed=plan_count
             )
+            last_plan = plan
 
             meals = ""
             for m, d in plan["meals"].items():
@@ -145,38 +241,101 @@ def main(page: ft.Page):
 🍞 Carbs: {plan['total_carb']} g
 🧈 Fat: {plan['total_fat']} g
 """
-            page.update()
+            with metrics.timer("ui.render"):
+                page.update()
         except Exception as ex:
             result_text.value = f"❌ Failed: {ex}"
             page.update()
 
-    # ---------------- CHATBOT ----------------
-    chat_display = ft.Column(scroll=ft.ScrollMode.AUTO, expand=True)
+    def find_substitutes(e):
+        if last_plan is None:
+            swap_text.value = "👆 Generate a plan first"
+            page.update()
+            return
+        try:
+            meal = swap_meal_dropdown.value or "lunch"
+            prefer = swap_goal_dropdown.value or "Similar"
+            food = last_plan["meals"][meal]["food"]
+
+            subs = get_planner().substitutes(
+                food, k=5, preference=pref_dropdown.value, allergy=allergy_dropdown.value,
+                **SWAP_GOALS[prefer]
+            )
+            if not subs:
+                swap_text.value = f"🤷 No {prefer.lower()} swap for {food}"
+            else:
+                lines = [f"🔄 {prefer} instead of {food} (per 100 g):"]
+                for s in subs:
+                    icon = "🥬" if s["type"] == "Veg" else "🍗"
+                    lines.append(f"{icon} {s['food']}: {int(s['kcal'])} kcal | "
+                                 f"P {s['prot']} g | C {s['carb']} g | F {s['fat']} g")
+                swap_text.value = "\n".join(lines)
+            with metrics.timer("ui.render"):
+                page.update()
+        except Exception as ex:
+            swap_text.value = f"❌ Failed: {ex}"
+            page.update()
 
-    def send_chat(e):
+    # ---------------- CHATBOT ----------------
+    # only a bounded window of messages lives in the ListView, and every
+    # change updates the ListView (or a single bubble), not the page
+    chat_display = ft.ListView(expand=True, spacing=8, auto_scroll=True)
+    earlier_button = ft.TextButton("⬆️ Earlier messages")
+    later_button = ft.TextButton("⬇️ Later messages", on_click=lambda e: transcript.load_newer())
+    transcript = ChatTranscript(chat_display, chat_message, read_chat_message, earlier_button, later_button)
+
+    # chat memory (history, facts, recall) is kept per client: an id stored
+    # on the client survives reloads and new tabs, so names and earlier
+    # sessions come back, and visitors never see each other's conversations
+    chat_user = None
+
+    async def get_chat_user():
+        nonlocal chat_user
+        if chat_user is None:
+            prefs = ft.SharedPreferences()
+            user = await prefs.get(CLIENT_ID_KEY)
+            if not user:
+                user = uuid.uuid4().hex
+                await prefs.set(CLIENT_ID_KEY, user)
+            chat_user = user
+        return chat_user
+
+    async def connect_history(chatbot):
+        user = await get_chat_user()
+        transcript.start_history(functools.partial(chatbot.history_page, user=user),
+                                 chatbot.history_end(user))
+        return user
+
+    async def load_earlier(e):
+        chatbot = await asyncio.to_thread(importlib.import_module, CHATBOT_MODULE)
+        await connect_history(chatbot)
+        transcript.load_older()
+
+    earlier_button.on_click = load_earlier
+
+    async def send_chat(e):
         user_msg = chat_input.value
         if not user_msg.strip():
             return
         chat_input.value = ""
+        chat_input.update()
 
-        # Show user message
-        chat_display.controls.append(
-            ft.Container(
-                content=ft.Text(f"You: {user_msg}", size=16, color=ft.Colors.BLACK),
-                padding=10,
-                bgcolor=ft.Colors.GREY_200,
-                border_radius=10,
-                width=350
-            )
-        )
+        # Show user message + placeholder while the bot is looking things up
+        transcript.add(user_msg, mine=True)
+        bubble = transcript.add("🤔 thinking…")
 
-        # Get bot response
-        bot_reply = get_smart_response(user_msg)
+        # Get bot response without blocking the page (the first message
+        # also imports the chatbot, off the event loop)
+        chatbot = await asyncio.to_thread(importlib.import_module, CHATBOT_MODULE)
+        user = await connect_history(chatbot)
+        bot_reply = await chatbot.get_smart_response_async(user_msg, user)
 
-        # Show bot message
-        chat_display.controls.append(
-            ft.Row([bot_msg(bot_reply),]))
-        page.update()
+        # Stream the answer into the placeholder
+        words = bot_reply.split(" ")
+        for i in range(0, len(words), STREAM_WORDS):
+            bubble.content.value = " ".join(words[:i + STREAM_WORDS])
+            transcript.update_message(bubble)
+            await asyncio.sleep(STREAM_DELAY_S)
 
     # ---------------- TABS ----------------
     diet_tab = ft.Column(
@@ -194,6 +353,9 @@ def main(page: ft.Page):
             ], wrap=True),
             ft.Divider(),
             result_text,
+            ft.Row([swap_meal_dropdown, swap_goal_dropdown], wrap=True),
+            ft.Button("🔄 Find substitutes", on_click=find_substitutes),
+            swap_text,
         ],
         visible=True
     )
@@ -202,6 +364,7 @@ def main(page: ft.Page):
         [
             ft.Text("🤖 Smart Chatbot", size=22, weight=ft.FontWeight.BOLD),
             chat_display,
+            later_button,
             ft.Row(
                 [chat_input, ft.Button("🚀", on_click=send_chat)],
                 alignment=ft.MainAxisAlignment.SPACE_BETWEEN
@@ -221,6 +384,7 @@ def main(page: ft.Page):
         diet_tab.visible = False
         chat_tab.visible = True
         page.update()
+        warm_up(CHATBOT_MODULE)
 
     # ---------------- PAGE LAYOUT ----------------
     page.add(
@@ -235,4 +399,6 @@ def main(page: ft.Page):
             ]
         )
     )
+    # first paint is done; the diet tab is the one on screen
+    warm_up(PLANNER_MODULE, "get_planner")
 
@@ -0,0 +1,222 @@
+# src/memory_store.py
+import os
+import json
+import sqlite3
+import threading
+from collections import deque
+
+# ---------------- SETTINGS ---------------- #
+
+DEFAULT_USER = "default"
+CACHED_HISTORY = 200        # recent Q&As per user kept in the read cache
+
+# Both backends expose the same API, with every call scoped to a user:
+#   add_chat(user, q, a)   history(user, limit=None)
+#   set_facts(user, **kv)  facts(user)
+#   history_end(user)      history_page(user, before=None, limit=50)
+#   forget(user)           drops what is cached in memory for the user
+# history_page returns (items, cursor): up to `limit` Q&As older than the
+# `before` cursor, oldest first, and the cursor for the page before them
+# (None once the start is reached). history_end is the cursor just past
+# the newest Q&A, so paging from it never returns anything added later.
+
+# ---------------- JSON BACKEND ---------------- #
+
+class JsonMemoryStore:
+    # the original memory.json layout ({"chat_history": [...], "user_name": ...})
+    # for the default user, other users under "users"; writes go to a temp
+    # file that replaces the old one, so a crash never leaves half a file
+
+    def __init__(self, path, history_limit=20):
+        self.path = path
+        self.history_limit = history_limit
+        self._lock = threading.Lock()
+        self._data = None
+
+    def _load(self):
+        if self._data is None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._data = json.load(f)
+            except (OSError, ValueError):
+                self._data = {"chat_history": []}
+        return self._data
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = f"{self.path}.tmp-{os.getpid()}-{threading.get_ident()}"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._data, f, indent=4)
+        os.replace(tmp, self.path)
+
+    def _user(self, user):
+        data = self._load()
+        if user == DEFAULT_USER:
+            return data
+        return data.setdefault("users", {}).setdefault(user, {"chat_history": []})
+
+    def add_chat(self, user, question, answer):
+        with self._lock:
+            ns = self._user(user)
+            history = ns.get("chat_history", [])
+            history.append({"q": question, "a": answer})
+            ns["chat_history"] = history[-self.history_limit:]
+            self._save()
+
+    def history(self, user, limit=None):
+        with self._lock:
+            history = list(self._user(user).get("chat_history", []))
+        return history[-limit:] if limit else history
+
+    def history_end(self, user):
+        with self._lock:
+            return len(self._user(user).get("chat_history", []))
+
+    def history_page(self, user, before=None, limit=50):
+        # cursors are list positions; history is capped at history_limit, so
+        # a page taken after the cap trims old entries may skip a few
+        with self._lock:
+            history = self._user(user).get("chat_history", [])
+            end = len(history) if before is None else min(before, len(history))
+            start = max(0, end - limit)
+            return list(history[start:end]), (start if start > 0 else None)
+
+    def set_facts(self, user, **facts):
+        with self._lock:
+            self._user(user).update(facts)
+            self._save()
+
+    def facts(self, user):
+        with self._lock:
+            ns = self._user(user)
+            return {k: v for k, v in ns.items() if k not in ("chat_history", "users")}
+
+    def forget(self, user):
+        pass        # the whole file is one cache, capped by history_limit
+
+# ---------------- SQLITE BACKEND ---------------- #
+
+class SqliteMemoryStore:
+    # WAL mode lets readers run next to a writer and each write is its own
+    # transaction, so concurrent sessions never lose each other's messages
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._history = {}      # user -> deque of recent {"q", "a"}
+        self._facts = {}        # user -> dict
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._conn() as db:
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS chat (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user TEXT NOT NULL,
+                    q TEXT NOT NULL,
+                    a TEXT NOT NULL
+                )
+            """)
+            db.execute("CREATE INDEX IF NOT EXISTS chat_user ON chat (user, id)")
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS facts (
+                    user TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT,
+                    PRIMARY KEY (user, key)
+                )
+            """)
+
+    def _conn(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def add_chat(self, user, question, answer):
+        with self._conn() as db:
+            db.execute("INSERT INTO chat (user, q, a) VALUES (?, ?, ?)", (user, question, answer))
+        with self._lock:
+            if user in self._history:
+                self._history[user].append({"q": question, "a": answer})
+
+    def history(self, user, limit=None):
+        with self._lock:
+            cached = self._history.get(user)
+        if cached is None:
+            rows = self._conn().execute(
+                "SELECT q, a FROM chat WHERE user = ? ORDER BY id DESC LIMIT ?", (user, CACHED_HISTORY)
+            ).fetchall()
+            cached = deque(({"q": q, "a": a} for q, a in reversed(rows)), maxlen=CACHED_HISTORY)
+            with self._lock:
+                cached = self._history.setdefault(user, cached)
+
+        if limit and limit <= CACHED_HISTORY:
+            return list(cached)[-limit:]
+        rows = self._conn().execute("SELECT q, a FROM chat WHERE user = ? ORDER BY id", (user,)).fetchall()
+        history = [{"q": q, "a": a} for q, a in rows]
+        return history[-limit:] if limit else history
+
+    def history_end(self, user):
+        row = self._conn().execute("SELECT MAX(id) FROM chat WHERE user = ?", (user,)).fetchone()
+        return (row[0] or 0) + 1
+
+    def history_page(self, user, before=None, limit=50):
+        # cursors are row ids, stable while new messages are added
+        rows = self._conn().execute(
+            "SELECT id, q, a FROM chat WHERE user = ? AND id < ? ORDER BY id DESC LIMIT ?",
+            (user, before if before is not None else 2**63 - 1, limit)
+        ).fetchall()
+        items = [{"q": q, "a": a} for _, q, a in reversed(rows)]
+        return items, (rows[-1][0] if len(rows) == limit else None)
+
+    def set_facts(self, user, **facts):
+        with self._conn() as db:
+            db.executemany(
+                "INSERT OR REPLACE INTO facts VALUES (?, ?, ?)",
+                [(user, k, json.dumps(v)) for k, v in facts.items()]
+            )
+        with self._lock:
+            if user in self._facts:
+                self._facts[user].update(facts)
+
+    def facts(self, user):
+        with self._lock:
+            if user in self._facts:
+                return dict(self._facts[user])
+        rows = self._conn().execute("SELECT key, value FROM facts WHERE user = ?", (user,)).fetchall()
+        facts = {k: json.loads(v) for k, v in rows}
+        with self._lock:
+            self._facts.setdefault(user, facts)
+        return dict(facts)
+
+    def forget(self, user):
+        with self._lock:
+            self._history.pop(user, None)
+            self._facts.pop(user, None)
+
+    def import_json(self, path, user=DEFAULT_USER):
+        # one-off migration of an existing memory.json
+        legacy = JsonMemoryStore(path)
+        for item in legacy.history(user):
+            self.add_chat(user, item["q"], item["a"])
+        facts = legacy.facts(user)
+        if facts:
+            self.set_facts(user, **facts)
+
+def open_memory_store(data_dir, backend=None):
+    backend = backend or os.environ.get("DIET_PRO_MEMORY", "sqlite")
+    json_file = os.path.join(data_dir, "memory.json")
+    if backend == "json":
+        return JsonMemoryStore(json_file)
+
+    db_file = os.path.join(data_dir, "memory.sqlite3")
+    fresh = not os.path.exists(db_file)
+    store = SqliteMemoryStore(db_file)
+    if fresh and os.path.exists(json_file):
+        store.import_json(json_file)
+    return store
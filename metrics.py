@@ -0,0 +1,179 @@
+# src/metrics.py
+import os
+import json
+import time
+import logging
+import threading
+
+# ---------------- SETTINGS ---------------- #
+
+# DIET_PRO_METRICS=0 turns every timer/counter into a no-op
+ENABLED = os.environ.get("DIET_PRO_METRICS", "1") != "0"
+BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000, float("inf"))
+
+log = logging.getLogger("diet_pro")
+
+_lock = threading.Lock()
+_counters = {}          # name -> int
+_timers = {}            # name -> {"count", "total_ms", "max_ms", "buckets"}
+_sources = {}           # name -> callable returning a dict of numbers
+
+def enable(flag=True):
+    global ENABLED
+    ENABLED = flag
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _timers.clear()
+
+# ---------------- RECORDING ---------------- #
+
+def incr(name, value=1):
+    if not ENABLED:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+def observe(name, ms):
+    if not ENABLED:
+        return
+    with _lock:
+        t = _timers.get(name)
+        if t is None:
+            t = _timers[name] = {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "buckets": [0] * len(BUCKETS_MS)}
+        t["count"] += 1
+        t["total_ms"] += ms
+        t["max_ms"] = max(t["max_ms"], ms)
+        for i, bound in enumerate(BUCKETS_MS):
+            if ms <= bound:
+                t["buckets"][i] += 1
+                break
+
+class _Timer:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.name, (time.perf_counter() - self.start) * 1000)
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return None
+
+_NULL_TIMER = _NullTimer()
+
+def timer(name):
+    # with metrics.timer("plan.sampling"): ...
+    return _Timer(name) if ENABLED else _NULL_TIMER
+
+def register_source(name, stats):
+    # modules with their own counters (caches, HTTP client) are pulled in at
+    # export time instead of pushing every update through here
+    _sources[name] = stats
+
+def drain():
+    # counters and timers recorded since the last drain, which are then
+    # reset; pool workers hand this back with each result for merge()
+    with _lock:
+        data = {"counters": dict(_counters), "timers": dict(_timers)}
+        _counters.clear()
+        _timers.clear()
+    return data
+
+def merge(data):
+    # adds what drain() returned in another process to this one's numbers
+    with _lock:
+        for name, value in data["counters"].items():
+            _counters[name] = _counters.get(name, 0) + value
+        for name, other in data["timers"].items():
+            t = _timers.get(name)
+            if t is None:
+                _timers[name] = {**other, "buckets": list(other["buckets"])}
+                continue
+            t["count"] += other["count"]
+            t["total_ms"] += other["total_ms"]
+            t["max_ms"] = max(t["max_ms"], other["max_ms"])
+            t["buckets"] = [a + b for a, b in zip(t["buckets"], other["buckets"])]
+
+# ---------------- DEBUG OUTPUT ---------------- #
+
+def debug(*parts):
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug(" ".join(str(p) for p in parts))
+
+def warn(*parts):
+    log.warning(" ".join(str(p) for p in parts))
+
+# ---------------- EXPORT ---------------- #
+
+def _flatten(prefix, value, out):
+    if isinstance(value, dict):
+        for k, v in value.items():
+            _flatten(f"{prefix}.{k}", v, out)
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        out[prefix] = value
+
+def snapshot():
+    with _lock:
+        data = {
+            "enabled": ENABLED,
+            "counters": dict(_counters),
+            "timers": {
+                name: {
+                    "count": t["count"],
+                    "total_ms": round(t["total_ms"], 3),
+                    "mean_ms": round(t["total_ms"] / t["count"], 3) if t["count"] else 0.0,
+                    "max_ms": round(t["max_ms"], 3),
+                    "buckets": {("+Inf" if b == float("inf") else str(b)): c
+                                for b, c in zip(BUCKETS_MS, t["buckets"])}
+                }
+                for name, t in _timers.items()
+            }
+        }
+    sources = {}
+    for name, stats in list(_sources.items()):
+        flat = {}
+        _flatten(name, stats(), flat)
+        sources.update(flat)
+    data["sources"] = sources
+    return data
+
+def export_json():
+    return json.dumps(snapshot(), indent=2)
+
+def _prom_name(name):
+    return "diet_pro_" + "".join(c if c.isalnum() else "_" for c in name)
+
+def export_prometheus():
+    data = snapshot()
+    lines = []
+    for name, value in sorted(data["counters"].items()):
+        metric = _prom_name(name) + "_total"
+        lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+
+    for name, t in sorted(data["timers"].items()):
+        metric = _prom_name(name) + "_ms"
+        lines.append(f"# TYPE {metric} histogram")
+        cumulative = 0
+        for bound, count in t["buckets"].items():
+            cumulative += count
+            lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f"{metric}_sum {t['total_ms']}")
+        lines.append(f"{metric}_count {t['count']}")
+
+    for name, value in sorted(data["sources"].items()):
+        metric = _prom_name(name)
+        lines += [f"# TYPE {metric} gauge", f"{metric} {value}"]
+    return "\n".join(lines) + "\n"
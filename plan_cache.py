@@ -0,0 +1,96 @@
+# src/plan_cache.py
+import time
+import threading
+from collections import OrderedDict
+from src import metrics
+
+# ---------------- SETTINGS ---------------- #
+
+CACHE_SIZE = 1024           # plans kept in memory
+TTL_S = 3600                # a cached plan is re-sampled after this
+
+# ---------------- CACHE ---------------- #
+
+class PlanCache:
+    # memoizes plan() for profiles that end up with the same inputs. Age,
+    # gender, height and activity only reach the sampler through the bmr()
+    # calorie target, and weight only through it and the macro limits, so
+    # the key is those two plus preference, allergy, solver and seed. The
+    # limits are the exact ones plan() checks: a plan is never handed to a
+    # profile whose fat/protein ranges differ from its own.
+    # BMI and body fat are only echoed in the result and are filled in per
+    # call. A seed of None shares one plan between everyone with that key.
+    # Entries are CompactPlans; every call gets a fresh dict built from one.
+
+    def __init__(self, size=CACHE_SIZE, ttl_s=TTL_S):
+        self.size = size
+        self.ttl_s = ttl_s
+        self._lru = OrderedDict()       # key -> (expires_at, CompactPlan)
+        self._stamp = None              # food table the cached plans came from
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0,
+                      "invalidations": 0, "size": 0, "hit_rate": 0.0}
+
+    def key(self, planner, age, gender, weight, height, activity, goal, preference, allergy,
+            solver="sample", seed=None):
+        calories = planner.bmr(age, gender, weight, height, activity, goal)
+        return (calories, planner._macro_limits(goal, weight), planner._index_key(preference, allergy),
+                solver, seed)
+
+    def plan(self, planner, age, gender, weight, height, bmi_status, body_fat,
+             neck, waist, activity, goal, preference, allergy, solver="sample", seed=None):
+        key = self.key(planner, age, gender, weight, height, activity, goal, preference, allergy,
+                       solver, seed)
+        stamp = planner.table_stamp
+        now = time.monotonic()
+
+        with self._lock:
+            if stamp != self._stamp:
+                if self._lru:
+                    self.stats["invalidations"] += 1
+                self._lru.clear()
+                self._stamp = stamp
+            entry = self._lru.get(key)
+            if entry and entry[0] > now:
+                self._lru.move_to_end(key)
+                self._count("hits")
+                return self._result(entry[1], bmi_status, body_fat)
+            if entry:
+                del self._lru[key]
+                self.stats["expired"] += 1
+            self._count("misses")
+
+        # errors (an infeasible exact plan) propagate and nothing is cached
+        with metrics.timer("plan_cache.miss"):
+            compact = planner.plan(age, gender, weight, height, bmi_status, body_fat, neck, waist,
+                                   activity, goal, preference, allergy, solver=solver, seed=seed,
+                                   compact=True)
+
+        with self._lock:
+            if stamp == self._stamp:
+                self._lru[key] = (now + self.ttl_s, compact)
+                self._lru.move_to_end(key)
+                while len(self._lru) > self.size:
+                    self._lru.popitem(last=False)
+                    self.stats["evictions"] += 1
+                self.stats["size"] = len(self._lru)
+        return compact.to_dict()
+
+    def clear(self):
+        with self._lock:
+            self._lru.clear()
+            self.stats["size"] = 0
+
+    def _result(self, cached, bmi_status, body_fat):
+        result = cached.to_dict()
+        result["bmi"], result["bmi_status"] = bmi_status[0], bmi_status[1]
+        result["body_fat"] = body_fat
+        return result
+
+    def _count(self, outcome):
+        self.stats[outcome] += 1
+        total = self.stats["hits"] + self.stats["misses"]
+        self.stats["hit_rate"] = round(self.stats["hits"] / total, 4)
+
+plan_cache = PlanCache()
+metrics.register_source("plan_cache", lambda: plan_cache.stats)
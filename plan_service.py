@@ -0,0 +1,458 @@
+# src/plan_service.py
+# The planner over HTTP/JSON, for other systems than the Flet UI:
+#   python -m src.plan_service --port 8080 --workers 4
+#
+#   POST /bmi       {"weight", "height"}
+#   POST /body_fat  {"gender", "height", "neck", "waist"}
+#   POST /bmr       {"age", "gender", "weight", "height", "activity", "goal"}
+#   POST /plan      bmr fields + "preference", "allergy"
+#                   (optional "neck", "waist", "solver", "seed"); only plans
+#                   asked for with a seed answer with one, batched plans
+#                   cannot be reproduced by plan() and leave it out
+#   GET  /health    GET /metrics (Prometheus text, ?format=json for JSON)
+import os
+import sys
+import json
+import signal
+import time
+import asyncio
+import argparse
+import numpy as np
+import pandas as pd
+from urllib.parse import urlsplit, parse_qs
+from src import metrics
+from src.diet_logic import InfeasiblePlanError, get_planner, planner_pool
+from src.plan_cache import plan_cache
+
+# ---------------- SETTINGS ---------------- #
+
+HOST = "127.0.0.1"
+PORT = 8080
+MAX_BATCH = 64              # plan requests grouped into one plan_batch() call
+MAX_WAIT_MS = 5             # how long the first request of a batch waits for company
+MAX_QUEUE = 2048            # plan requests queued or running before new ones get a 503
+IN_FLIGHT = 2               # batches handed to each worker at a time
+REQUEST_TIMEOUT_S = 30
+MAX_BODY = 64 * 1024
+MAX_HEADERS = 64
+
+BMI_FIELDS = ("weight", "height")
+BODY_FAT_FIELDS = ("gender", "height", "neck", "waist")
+BMR_FIELDS = ("age", "gender", "weight", "height", "activity", "goal")
+PLAN_FIELDS = BMR_FIELDS + ("preference", "allergy")
+NUMBERS = ("age", "weight", "height", "neck", "waist")
+TEXTS = ("gender", "activity", "goal", "preference", "allergy", "solver")
+SOLVERS = ("sample", "exact")
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               413: "Payload Too Large", 422: "Unprocessable Entity", 500: "Internal Server Error",
+               503: "Service Unavailable", 504: "Gateway Timeout"}
+
+class HTTPError(Exception):
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+# ---------------- WORKER ---------------- #
+
+# Planning runs in a process pool: every worker memory-maps the same food
+# store and answers with JSON text, so the event loop only moves bytes. The
+# metrics and plan cache counts a worker records go back with each answer.
+
+def _json(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"not JSON serializable: {type(value).__name__}")
+
+def in_worker(fn, *args):
+    result = fn(*args)
+    return result, metrics.drain(), (os.getpid(), dict(plan_cache.stats))
+
+def plan_group(records):
+    # one vectorized plan_batch() for a micro-batch, answering (status, json)
+    # per row: a row it cannot plan gets its own error, never the whole batch
+    planner = get_planner()
+    body = planner.body_metrics(pd.DataFrame.from_records(records))
+    good = body["calories"].notna().to_numpy()
+    rows = [r for r, ok in zip(records, good) if ok]
+    try:
+        plans = planner.plan_batch(rows)
+    except Exception:
+        # find the culprit: plan the rows one by one
+        plans = [_plan_alone(planner, r) for r in rows]
+    plans = iter(plans)
+
+    out = []
+    for ok in good:
+        plan = next(plans) if ok else {"error": "invalid age/weight/height"}
+        if "error" in plan:
+            out.append((400, json.dumps(plan)))
+        else:
+            # the batch's seed depends on the whole batch, not this profile
+            plan.pop("seed", None)
+            out.append((200, json.dumps(plan, default=_json)))
+    return out
+
+def _plan_alone(planner, record):
+    try:
+        return planner.plan_batch([record])[0]
+    except Exception as e:
+        metrics.warn("plan service row error:", repr(e))
+        return {"error": f"cannot plan this profile ({type(e).__name__})"}
+
+def plan_single(record):
+    # seeded or exact requests: plan() through the per-process cache, so the
+    # same request always gets the same plan whatever else is in flight
+    planner = get_planner()
+    bmi_status = planner.calculate_bmi(record["weight"], record["height"])
+    body_fat = None
+    if record.get("neck") is not None and record.get("waist") is not None:
+        try:
+            body_fat, _ = planner.navy_body_fat(record["gender"], record["height"],
+                                                record["neck"], record["waist"])
+        except ValueError:
+            pass
+    try:
+        plan = plan_cache.plan(
+            planner, record["age"], record["gender"], record["weight"], record["height"],
+            bmi_status, body_fat, record.get("neck"), record.get("waist"), record["activity"],
+            record["goal"], record["preference"], record["allergy"],
+            solver=record.get("solver", "sample"), seed=record.get("seed")
+        )
+    except InfeasiblePlanError as e:
+        return 422, json.dumps({"error": str(e)})
+    return 200, json.dumps(plan, default=_json)
+
+# ---------------- BATCHING ---------------- #
+
+class PlanScheduler:
+    # Unseeded sample plans wait up to MAX_WAIT_MS in a queue and go to the
+    # pool as one plan_batch() of up to MAX_BATCH profiles; seeded and exact
+    # plans go one by one. At most workers * IN_FLIGHT tasks are in the pool
+    # and at most max_queue requests are waiting or running; past that
+    # plan() raises a 503 instead of letting the queue grow.
+
+    def __init__(self, pool, workers, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS, max_queue=MAX_QUEUE):
+        self.pool = pool
+        self.workers = workers
+        self.max_batch = max_batch
+        self.max_wait_s = max_wait_ms / 1000
+        self.max_queue = max_queue
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(workers * IN_FLIGHT)
+        self._caches = {}          # worker pid -> its plan_cache stats
+        self._task = None
+        self.stats = {"queue_depth": 0, "in_flight": 0, "batches": 0, "batched_plans": 0,
+                      "mean_batch": 0.0, "rejected": 0, "workers": workers, "max_queue": max_queue}
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def _admit(self):
+        if self.stats["queue_depth"] >= self.max_queue:
+            self.stats["rejected"] += 1
+            metrics.incr("service.rejected")
+            raise HTTPError(503, "planner busy, retry shortly", {"Retry-After": "1"})
+        self.stats["queue_depth"] += 1
+
+    async def plan(self, record):
+        self._admit()
+        try:
+            if record.get("seed") is not None or record.get("solver", "sample") != "sample":
+                async with self._slots:
+                    self.stats["in_flight"] += 1
+                    try:
+                        return await self._in_pool(plan_single, record)
+                    finally:
+                        self.stats["in_flight"] -= 1
+
+            future = asyncio.get_running_loop().create_future()
+            self._queue.put_nowait((record, future))
+            return await future
+        finally:
+            self.stats["queue_depth"] -= 1
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait_s
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # requests that timed out while waiting are not planned
+            batch = [(r, f) for r, f in batch if not f.done()]
+            if not batch:
+                continue
+
+            await self._slots.acquire()
+            self.stats["in_flight"] += 1
+            self.stats["batches"] += 1
+            self.stats["batched_plans"] += len(batch)
+            self.stats["mean_batch"] = round(self.stats["batched_plans"] / self.stats["batches"], 2)
+            metrics.incr("service.batches")
+            loop.create_task(self._dispatch(batch))
+
+    async def _in_pool(self, fn, *args):
+        result, recorded, (pid, cache) = await asyncio.get_running_loop().run_in_executor(
+            self.pool, in_worker, fn, *args)
+        metrics.merge(recorded)
+        self._caches[pid] = cache
+        return result
+
+    def cache_stats(self):
+        # every worker has its own plan cache: report them summed
+        total = {}
+        for stats in list(self._caches.values()):
+            for k, v in stats.items():
+                total[k] = total.get(k, 0) + v
+        lookups = total.get("hits", 0) + total.get("misses", 0)
+        total["hit_rate"] = round(total.get("hits", 0) / lookups, 4) if lookups else 0.0
+        return total
+
+    async def _dispatch(self, batch):
+        try:
+            with metrics.timer("service.batch"):
+                texts = await self._in_pool(plan_group, [r for r, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for (_, future), answer in zip(batch, texts):
+                if not future.done():
+                    future.set_result(answer)
+        finally:
+            self.stats["in_flight"] -= 1
+            self._slots.release()
+
+# ---------------- REQUESTS ---------------- #
+
+def _fields(payload, names):
+    missing = [n for n in names if payload.get(n) in (None, "")]
+    if missing:
+        raise HTTPError(400, f"missing fields: {', '.join(missing)}")
+    record = {}
+    for name, value in payload.items():
+        if name in TEXTS and value is not None and not isinstance(value, str):
+            raise HTTPError(400, f"{name} must be a string")
+        if name in NUMBERS and value is not None:
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                raise HTTPError(400, f"{name} must be a number") from None
+            if not value > 0:
+                raise HTTPError(400, f"{name} must be positive")
+        record[name] = value
+    return record
+
+def _plan_record(payload):
+    record = _fields(payload, PLAN_FIELDS)
+    plan = {k: record.get(k) for k in PLAN_FIELDS + ("neck", "waist")}
+    if record.get("solver", "sample") not in SOLVERS:
+        raise HTTPError(400, f"solver must be one of {', '.join(SOLVERS)}")
+    if record.get("solver") is not None:
+        plan["solver"] = record["solver"]
+    if record.get("seed") is not None:
+        try:
+            plan["seed"] = int(record["seed"])
+        except (TypeError, ValueError):
+            raise HTTPError(400, "seed must be an integer") from None
+    return plan
+
+class PlanService:
+    def __init__(self, scheduler):
+        self.scheduler = scheduler
+        self.started = time.time()
+
+    async def route(self, method, target, body):
+        url = urlsplit(target)
+        path = url.path.rstrip("/") or "/"
+
+        if path == "/health":
+            return 200, json.dumps({"status": "ok", "uptime_s": round(time.time() - self.started, 1)}), "application/json"
+        if path == "/metrics":
+            if parse_qs(url.query).get("format") == ["json"]:
+                return 200, metrics.export_json(), "application/json"
+            return 200, metrics.export_prometheus(), "text/plain; version=0.0.4"
+
+        handler = {"/bmi": self.bmi, "/body_fat": self.body_fat, "/bmr": self.bmr, "/plan": self.plan}.get(path)
+        if handler is None:
+            raise HTTPError(404, f"no such endpoint: {path}")
+        if method != "POST":
+            raise HTTPError(405, "use POST with a JSON body")
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            raise HTTPError(400, "body is not valid JSON") from None
+        if not isinstance(payload, dict):
+            raise HTTPError(400, "body must be a JSON object")
+
+        with metrics.timer(f"service{path.replace('/', '.')}"):
+            status, text = await handler(payload)
+        return status, text, "application/json"
+
+    async def bmi(self, payload):
+        r = _fields(payload, BMI_FIELDS)
+        bmi, status = get_planner().calculate_bmi(r["weight"], r["height"])
+        return 200, json.dumps({"bmi": bmi, "bmi_status": status})
+
+    async def body_fat(self, payload):
+        r = _fields(payload, BODY_FAT_FIELDS)
+        try:
+            body_fat, method = get_planner().navy_body_fat(r["gender"], r["height"], r["neck"], r["waist"])
+        except ValueError:
+            raise HTTPError(422, "waist must be larger than neck") from None
+        return 200, json.dumps({"body_fat": body_fat, "method": method})
+
+    async def bmr(self, payload):
+        r = _fields(payload, BMR_FIELDS)
+        calories = get_planner().bmr(r["age"], r["gender"], r["weight"], r["height"], r["activity"], r["goal"])
+        return 200, json.dumps({"calories": calories})
+
+    async def plan(self, payload):
+        record = _plan_record(payload)
+        try:
+            return await asyncio.wait_for(self.scheduler.plan(record), REQUEST_TIMEOUT_S)
+        except asyncio.TimeoutError:
+            raise HTTPError(504, "planning timed out") from None
+
+# ---------------- HTTP ---------------- #
+
+async def read_request(reader):
+    # a small HTTP/1.1 reader: request line, headers, Content-Length body
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, version = line.decode("latin-1").split()
+    except ValueError:
+        raise HTTPError(400, "malformed request line") from None
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n"):
+            break
+        if not line:
+            raise asyncio.IncompleteReadError(line, None)
+        if len(headers) >= MAX_HEADERS:
+            raise HTTPError(400, "too many headers")
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get("content-length") or 0)
+    except ValueError:
+        raise HTTPError(400, "Content-Length must be an integer") from None
+    if length < 0:
+        raise HTTPError(400, "Content-Length must not be negative")
+    if length > MAX_BODY:
+        raise HTTPError(413, f"body larger than {MAX_BODY} bytes")
+    body = await reader.readexactly(length) if length else b""
+
+    keep_alive = headers.get("connection", "").lower() != "close" and version != "HTTP/1.0"
+    return method.upper(), target, body, keep_alive
+
+def write_response(writer, status, text, content_type="application/json", headers=None, keep_alive=True):
+    body = text.encode("utf-8")
+    head = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}",
+            f"Content-Type: {content_type}",
+            f"Content-Length: {len(body)}",
+            "Connection: keep-alive" if keep_alive else "Connection: close"]
+    head += [f"{k}: {v}" for k, v in (headers or {}).items()]
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+
+async def serve(service, host=HOST, port=PORT):
+    async def handle(reader, writer):
+        try:
+            while True:
+                keep_alive = False
+                try:
+                    request = await read_request(reader)
+                    if request is None:
+                        break
+                    method, target, body, keep_alive = request
+                    metrics.incr("service.requests")
+                    status, text, ctype = await service.route(method, target, body)
+                    write_response(writer, status, text, ctype, keep_alive=keep_alive)
+                except HTTPError as e:
+                    metrics.incr(f"service.http_{e.status}")
+                    write_response(writer, e.status, json.dumps({"error": str(e)}),
+                                   headers=e.headers, keep_alive=keep_alive)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except Exception as e:
+                    metrics.incr("service.http_500")
+                    metrics.warn("plan service error:", repr(e))
+                    write_response(writer, 500, json.dumps({"error": "internal error"}), keep_alive=False)
+                    keep_alive = False
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port, backlog=1024)
+
+# ---------------- MAIN ---------------- #
+
+async def run(host=HOST, port=PORT, workers=None, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS,
+              max_queue=MAX_QUEUE):
+    workers = workers or os.cpu_count() or 1
+    with planner_pool(workers) as pool:
+        scheduler = PlanScheduler(pool, workers, max_batch, max_wait_ms, max_queue)
+        metrics.register_source("service", lambda: scheduler.stats)
+        metrics.register_source("plan_cache", scheduler.cache_stats)
+        scheduler.start()
+        server = await serve(PlanService(scheduler), host, port)
+        print(f"🚀 Diet Pro plan service on http://{host}:{port} ({workers} workers)", flush=True)
+
+        # SIGTERM stops like Ctrl+C, so the pool's workers are shut down too
+        main_task = asyncio.current_task()
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, main_task.cancel)
+        except NotImplementedError:
+            pass        # Windows
+        try:
+            async with server:
+                await server.serve_forever()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            await scheduler.stop()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Diet Pro planning service")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--workers", type=int, default=None, help="planner processes (default: cores)")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS)
+    parser.add_argument("--max-queue", type=int, default=MAX_QUEUE)
+    args = parser.parse_args(argv)
+
+    try:
+        asyncio.run(run(args.host, args.port, args.workers, args.max_batch, args.max_wait_ms, args.max_queue))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+# src/recall_index.py
+import re
+import math
+import threading
+from collections import Counter, defaultdict
+
+# ---------------- SETTINGS ---------------- #
+
+NGRAM = 3
+SEED_GRAMS = 8          # rarest query grams used to pick candidates
+MAX_POSTINGS = 1000     # most recent docs walked per seed gram
+MAX_CANDIDATES = 64     # docs that get a full score
+
+def normalize(text):
+    text = re.sub(r"[^\w\s]", " ", text.lower())
+    return " ".join(text.split())
+
+def ngrams(text, n=NGRAM):
+    text = f" {text} "
+    return {text[i:i + n] for i in range(max(1, len(text) - n + 1))}
+
+# ---------------- INDEX ---------------- #
+
+class RecallIndex:
+    # character n-gram inverted index over past questions. A match is scored
+    # by how much of the query's idf weight the stored question contains, so
+    # an exact or substring repeat scores 1.0 and typos still score high.
+    # symmetric=True scores by weighted Jaccard over both gram sets instead,
+    # so a query that is only part of a stored question does not count as
+    # a repeat of it.
+    # Only the rarest query grams are walked to find candidates, which keeps
+    # lookups flat as history grows.
+
+    def __init__(self):
+        self._postings = defaultdict(list)     # gram -> [doc ids]
+        self._grams = []                       # doc id -> set of grams
+        self._answers = []                     # doc id -> latest answer
+        self._by_question = {}                 # normalized question -> doc id
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._answers)
+
+    def add(self, question, answer):
+        key = normalize(question)
+        if not key:
+            return
+        with self._lock:
+            doc = self._by_question.get(key)
+            if doc is not None:
+                self._answers[doc] = answer     # same question: newest answer wins
+                return
+            doc = len(self._answers)
+            grams = ngrams(key)
+            self._by_question[key] = doc
+            self._grams.append(grams)
+            self._answers.append(answer)
+            for g in grams:
+                self._postings[g].append(doc)
+
+    def _idf(self, gram):
+        return math.log(1 + len(self._answers) / (1 + len(self._postings.get(gram, ()))))
+
+    def search(self, query, min_score=0.75, symmetric=False):
+        key = normalize(query)
+        if not key:
+            return None, 0.0
+        with self._lock:
+            doc = self._by_question.get(key)
+            if doc is not None:
+                return self._answers[doc], 1.0
+
+            weights = {g: self._idf(g) for g in ngrams(key)}
+            total = sum(weights.values())
+            known = [g for g in weights if g in self._postings]
+            if not known or total == 0:
+                return None, 0.0
+
+            # candidates come from the rarest grams: docs sharing the most of
+            # them get a full score, a typo only knocks out the few grams
+            # that overlap it
+            seeds = sorted(known, key=lambda g: len(self._postings[g]))[:SEED_GRAMS]
+            hits = Counter()
+            for g in seeds:
+                hits.update(self._postings[g][-MAX_POSTINGS:])
+            candidates = [doc for doc, _ in hits.most_common(MAX_CANDIDATES)]
+
+            best, best_score = None, 0.0
+            for doc in candidates:
+                grams = self._grams[doc]
+                shared = sum(w for g, w in weights.items() if g in grams)
+                if symmetric:
+                    union = total + sum(self._idf(g) for g in grams if g not in weights)
+                    score = shared / union
+                else:
+                    score = shared / total
+                # newer docs win ties
+                if score > best_score or (score == best_score and best is not None and doc > best):
+                    best, best_score = doc, score
+
+            if best is None or best_score < min_score:
+                return None, best_score
+            return self._answers[best], best_score
@@ -0,0 +1,66 @@
+# src/tests/http_stub.py
+import json
+import time
+import threading
+from collections import Counter
+from urllib.parse import urlsplit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class StubServer:
+    # local HTTP server for the client tests. route(path, *replies) sets the
+    # (status, body, delay_s) answers for a path, one per request and the
+    # last one repeating, so tests can inject slowness and 5xx errors.
+
+    def __init__(self):
+        self.routes = {}
+        self.hits = Counter()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                path = urlsplit(self.path).path
+                with stub._lock:
+                    stub.hits[path] += 1
+                    n = stub.hits[path]
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                try:
+                    replies = stub.routes.get(path) or [(404, "", 0)]
+                    status, body, delay_s = replies[min(n, len(replies)) - 1]
+                    time.sleep(delay_s)
+                    data = (body if isinstance(body, str) else json.dumps(body)).encode()
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                finally:
+                    with stub._lock:
+                        stub.in_flight -= 1
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def route(self, path, *replies):
+        with self._lock:
+            self.routes[path] = list(replies)
+            self.hits[path] = 0
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
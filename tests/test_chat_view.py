@@ -0,0 +1,90 @@
+# src/tests/test_chat_view.py
+import unittest
+from src.chat_view import ChatTranscript
+
+class FakeControl:
+    # stands in for the UI toolkit's controls: a text, a visibility and a
+    # count of update() calls
+    def __init__(self, text="", mine=False):
+        self.text = text
+        self.mine = mine
+        self.visible = True
+        self.updates = 0
+
+    def update(self):
+        self.updates += 1
+
+class FakeView(FakeControl):
+    def __init__(self):
+        super().__init__()
+        self.controls = []
+
+def history_page(total):
+    # a memory store holding `total` Q&As, with list positions as cursors
+    def page(before, limit):
+        start = max(0, before - limit)
+        items = [{"q": f"q{i}", "a": f"a{i}"} for i in range(start, before)]
+        return items, (start if start > 0 else None)
+    return page
+
+class ChatTranscriptTest(unittest.TestCase):
+    def setUp(self):
+        self.view = FakeView()
+        self.more, self.later = FakeControl(), FakeControl()
+        self.transcript = ChatTranscript(self.view, FakeControl, lambda c: (c.text, c.mine),
+                                         self.more, self.later, window=20, page_size=5)
+
+    def texts(self):
+        return [c.text for c in self.view.controls[1:]]
+
+    def test_adding_keeps_the_window(self):
+        for i in range(50):
+            self.transcript.add(f"m{i}")
+        self.assertEqual(len(self.transcript), 20)
+        self.assertEqual(self.texts()[-1], "m49")
+        self.assertTrue(self.more.visible)
+
+    def test_paging_back_keeps_the_window(self):
+        self.transcript.start_history(history_page(1000), 1000)
+        for i in range(30):
+            self.transcript.add(f"m{i}")
+        for _ in range(100):
+            self.transcript.load_older()
+            self.assertLessEqual(len(self.transcript), 20)
+        self.assertTrue(self.later.visible)
+        self.assertEqual(self.texts()[0], "q505")
+
+    def test_later_messages_come_back_in_order(self):
+        for i in range(40):
+            self.transcript.add(f"m{i}")
+        self.transcript.load_older()
+        self.transcript.load_older()
+        self.assertEqual(self.texts(), [f"m{i}" for i in range(0, 20)])
+        while self.later.visible:
+            self.transcript.load_newer()
+        self.assertEqual(self.texts(), [f"m{i}" for i in range(20, 40)])
+
+    def test_new_message_returns_to_the_latest(self):
+        for i in range(40):
+            self.transcript.add(f"m{i}")
+        self.transcript.load_older()
+        self.transcript.add("new")
+        self.assertEqual(self.texts()[-2:], ["m39", "new"])
+        self.assertEqual(len(self.transcript), 20)
+        self.assertFalse(self.later.visible)
+
+    def test_paged_out_bubble_keeps_streaming(self):
+        for i in range(29):
+            self.transcript.add(f"m{i}")
+        bubble = self.transcript.add("thinking")
+        self.transcript.load_older()
+        self.transcript.load_older()
+        bubble.text = "the answer"
+        self.transcript.update_message(bubble)
+        self.assertEqual(bubble.updates, 0)
+        while self.later.visible:
+            self.transcript.load_newer()
+        self.assertEqual(self.texts()[-1], "the answer")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+# src/tests/test_chatbot_search.py
+import time
+import asyncio
+import tempfile
+import unittest
+from src.lookup_cache import LookupCache
+from src.tests.http_stub import StubServer
+
+try:
+    from src import chatbot
+except ImportError as ex:       # autocorrect / mathbot not installed
+    chatbot = None
+    SKIP_REASON = f"chatbot unavailable: {ex}"
+
+@unittest.skipIf(chatbot is None, SKIP_REASON if chatbot is None else "")
+class SearchAsyncTest(unittest.TestCase):
+    # search_async races Wikipedia and DuckDuckGo, both pointed at a local
+    # stub server, and must return the first useful answer
+
+    def setUp(self):
+        self.server = StubServer()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.saved = {name: getattr(chatbot, name) for name in
+                      ["WIKI_SEARCH_URL", "WIKI_SUMMARY_URL", "DDG_URL", "lookup_cache"]}
+        chatbot.WIKI_SEARCH_URL = self.server.url + "/w/api.php"
+        chatbot.WIKI_SUMMARY_URL = self.server.url + "/summary/"
+        chatbot.DDG_URL = self.server.url + "/ddg/"
+        chatbot.lookup_cache = LookupCache(f"{self.tmp.name}/lookup_cache.sqlite3")
+
+    def tearDown(self):
+        for name, value in self.saved.items():
+            setattr(chatbot, name, value)
+        self.server.close()
+        self.tmp.cleanup()
+
+    def wiki(self, delay_s, extract="wiki answer"):
+        self.server.route("/w/api.php", (200, ["turmeric", ["Turmeric"], [""], [""]], delay_s))
+        self.server.route("/summary/Turmeric", (200, {"extract": extract}, 0))
+
+    def search(self, query="turmeric"):
+        # timed inside the loop: asyncio.run() also waits for the losing
+        # lookup's worker thread before it returns
+        async def timed():
+            start = time.perf_counter()
+            result = await chatbot.search_async(query)
+            return result, time.perf_counter() - start
+        return asyncio.run(timed())
+
+    def test_fast_backend_wins(self):
+        self.wiki(delay_s=1.0)
+        self.server.route("/ddg/", (200, {"AbstractText": "ddg answer"}, 0))
+        result, elapsed = self.search()
+        self.assertEqual(result, "ddg answer")
+        self.assertLess(elapsed, 1.0)
+
+    def test_empty_answer_does_not_win(self):
+        self.wiki(delay_s=0.3)
+        self.server.route("/ddg/", (200, {"AbstractText": "", "RelatedTopics": []}, 0))
+        result, _ = self.search()
+        self.assertEqual(result, "wiki answer")
+
+    def test_failing_backend_falls_back_to_the_other(self):
+        self.wiki(delay_s=0.2)
+        self.server.route("/ddg/", (503, "", 0))
+        result, _ = self.search()
+        self.assertEqual(result, "wiki answer")
+
+    def test_losing_lookup_stops_retrying(self):
+        self.server.route("/w/api.php", (503, "", 0.3))
+        self.server.route("/ddg/", (200, {"AbstractText": "ddg answer"}, 0))
+        result, _ = self.search()
+        self.assertEqual(result, "ddg answer")
+        time.sleep(0.8)         # long enough for the retries the loser would have made
+        self.assertEqual(self.server.hits["/w/api.php"], 1)
+
+    def test_no_answer_anywhere(self):
+        self.server.route("/w/api.php", (200, ["nothing", [], [], []], 0))
+        self.server.route("/ddg/", (200, {"AbstractText": "", "RelatedTopics": []}, 0))
+        result, _ = self.search("nothing")
+        self.assertIsNone(result)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+# src/tests/test_diet_logic.py
+import unittest
+from src.diet_logic import SimpleINDBDiet, InfeasiblePlanError
+
+PROFILE = {"age": 30, "weight": 80.0, "height": 178.0, "neck": 38.0, "waist": 88.0,
+           "activity": "Moderate(Walk+Light Excersises)", "goal": "Maintenance",
+           "preference": "Veg+Egg+Non-Veg", "allergy": "None"}
+
+class GenderSpellingTest(unittest.TestCase):
+    # plan(), plan_batch() and the bulk metrics must agree for every
+    # spelling the UI, the CLI and the service send
+
+    @classmethod
+    def setUpClass(cls):
+        cls.planner = SimpleINDBDiet(store_dir=None)
+
+    def plan(self, gender):
+        p = PROFILE
+        return self.planner.plan(p["age"], gender, p["weight"], p["height"], (None, None), None,
+                                 p["neck"], p["waist"], p["activity"], p["goal"], p["preference"],
+                                 p["allergy"], seed=1)
+
+    def test_plan_and_plan_batch_agree(self):
+        for gender in ["m", "male", "Male", " MALE ", "f", "female", "Female"]:
+            with self.subTest(gender=gender):
+                single = self.plan(gender)
+                batch = self.planner.plan_batch([{**PROFILE, "gender": gender}], seed=1)[0]
+                self.assertEqual(single["target_calories"], batch["target_calories"])
+                self.assertEqual(single["fat_range"], batch["fat_range"])
+
+    def test_spellings_pick_the_same_formula(self):
+        male = {self.plan(g)["target_calories"] for g in ["m", "male", "Male"]}
+        female = {self.plan(g)["target_calories"] for g in ["f", "female", "Female"]}
+        self.assertEqual(len(male), 1)
+        self.assertEqual(len(female), 1)
+        self.assertNotEqual(male, female)
+
+    def test_bulk_body_metrics_match_scalar(self):
+        p = PROFILE
+        for gender in ["m", "Male", "female"]:
+            with self.subTest(gender=gender):
+                row = self.planner.body_metrics([{**p, "gender": gender}]).iloc[0]
+                body_fat, _ = self.planner.navy_body_fat(gender, p["height"], p["neck"], p["waist"])
+                calories = self.planner.bmr(p["age"], gender, p["weight"], p["height"],
+                                            p["activity"], p["goal"])
+                self.assertEqual(row["body_fat"], body_fat)
+                self.assertEqual(row["calories"], calories)
+
+class ExactSolverTest(unittest.TestCase):
+    # heavy weight-loss profiles whose macro limits no 12/24-food kcal
+    # window can meet, though plans meeting them exist in the full pool
+
+    HARD = [
+        (50, "m", 109.9, 184.9, "Very active(Workout GYM + Sports)", "Veg+Egg+Non-Veg", "Egg"),
+        (29, "m", 109.1, 176.1, "Sedentary(No activity)", "Veg+Egg+Non-Veg", "None"),
+        (40, "f", 109.6, 157.4, "Sedentary(No activity)", "Veg", "None"),
+    ]
+
+    @classmethod
+    def setUpClass(cls):
+        cls.planner = SimpleINDBDiet(store_dir=None)
+
+    def test_repair_finds_plans_outside_the_window(self):
+        for age, gender, weight, height, activity, preference, allergy in self.HARD:
+            with self.subTest(weight=weight, preference=preference, allergy=allergy):
+                result = self.planner.plan(age, gender, weight, height, (None, None), None, 35, 90,
+                                           activity, "Weight loss", preference, allergy, solver="exact")
+                self.assertTrue(result["constraints_met"])
+
+    def test_impossible_limits_still_raise(self):
+        with self.assertRaises(InfeasiblePlanError):
+            self.planner.plan(30, "m", 400, 180, (None, None), None, 35, 90, "Light(Walk)",
+                              "Weight loss", "Veg", "None", solver="exact")
+
+class MultiDayTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.planner = SimpleINDBDiet(store_dir=None)
+
+    def week(self, seed, days=7):
+        p = PROFILE
+        return self.planner.plan_days(p["age"], "f", p["weight"], p["height"], (None, None), None,
+                                      p["neck"], p["waist"], p["activity"], p["goal"], p["preference"],
+                                      p["allergy"], days=days, seed=seed)
+
+    def test_no_food_twice_in_a_day(self):
+        for seed in range(30):
+            week = self.week(seed)
+            week = self.planner.replan_meal(week, 2, "snack", seed=seed)
+            for day, picks in enumerate(week["state"]["picks"]):
+                with self.subTest(seed=seed, day=day):
+                    self.assertEqual(len(set(picks)), len(picks))
+
+    def test_days_must_be_positive(self):
+        with self.assertRaises(ValueError):
+            self.week(1, days=0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+# src/tests/test_http_client.py
+import time
+import threading
+import unittest
+from src.http_client import HttpClient, CircuitOpenError, HostBusyError, RequestCancelled
+from src.tests.http_stub import StubServer
+
+class HttpClientTest(unittest.TestCase):
+    def setUp(self):
+        self.server = StubServer()
+        self.client = HttpClient(timeout_s=5, retries=2)
+
+    def tearDown(self):
+        self.client.session.close()
+        self.server.close()
+
+    def breaker(self, path, failures=2, reset_s=0.2):
+        # the breaker is created on first use of a host; tighten it for tests
+        _, state = self.client._host(self.server.url + path)
+        state["breaker"].failures = failures
+        state["breaker"].reset_s = reset_s
+        return state["breaker"]
+
+    # ---------------- RETRIES ---------------- #
+
+    def test_retries_5xx_then_succeeds(self):
+        self.server.route("/flaky", (503, "", 0), (502, "", 0), (200, {"ok": True}, 0))
+        res = self.client.get(self.server.url + "/flaky")
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json(), {"ok": True})
+        self.assertEqual(self.server.hits["/flaky"], 3)
+
+    def test_gives_up_after_retries(self):
+        self.server.route("/down", (500, "", 0))
+        res = self.client.get(self.server.url + "/down")
+        self.assertEqual(res.status_code, 500)
+        self.assertEqual(self.server.hits["/down"], 3)      # first try + 2 retries
+        self.assertEqual(self.client.stats()[self.server.url[7:]]["errors"], 1)
+
+    # ---------------- PER-HOST LIMIT ---------------- #
+
+    def test_limits_requests_in_flight_per_host(self):
+        client = HttpClient(timeout_s=5, max_per_host=2, retries=0)
+        self.server.route("/slow", (200, {}, 0.2))
+        threads = [threading.Thread(target=client.get, args=(self.server.url + "/slow",)) for _ in range(6)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(self.server.hits["/slow"], 6)
+        self.assertEqual(self.server.max_in_flight, 2)
+
+    def test_busy_host_raises(self):
+        client = HttpClient(timeout_s=0.1, max_per_host=1, retries=0)
+        self.server.route("/slow", (200, {}, 0.5))
+        worker = threading.Thread(target=client.get, args=(self.server.url + "/slow",), kwargs={"timeout": 5})
+        worker.start()
+        time.sleep(0.1)
+        with self.assertRaises(HostBusyError):
+            client.get(self.server.url + "/slow", timeout=5)
+        worker.join()
+
+    # ---------------- CANCEL ---------------- #
+
+    def test_cancel_stops_retries(self):
+        self.server.route("/down", (503, "", 0.3))
+        cancel = threading.Event()
+        threading.Timer(0.1, cancel.set).start()
+        with self.assertRaises(RequestCancelled):
+            self.client.get(self.server.url + "/down", cancel=cancel)
+        self.assertEqual(self.server.hits["/down"], 1)      # the attempt already sent
+        self.assertEqual(self.client.stats()[self.server.url[7:]]["errors"], 0)
+
+    def test_cancel_while_waiting_for_a_slot(self):
+        client = HttpClient(timeout_s=5, max_per_host=1, retries=0)
+        self.server.route("/slow", (200, {}, 0.5))
+        worker = threading.Thread(target=client.get, args=(self.server.url + "/slow",))
+        worker.start()
+        time.sleep(0.1)
+        cancel = threading.Event()
+        threading.Timer(0.1, cancel.set).start()
+        start = time.perf_counter()
+        with self.assertRaises(RequestCancelled):
+            client.get(self.server.url + "/slow", cancel=cancel)
+        self.assertLess(time.perf_counter() - start, 0.3)
+        worker.join()
+        self.assertEqual(self.server.hits["/slow"], 1)
+
+    # ---------------- CIRCUIT BREAKER ---------------- #
+
+    def test_breaker_opens_probes_and_closes(self):
+        client = self.client = HttpClient(timeout_s=5, retries=0)
+        breaker = self.breaker("/api")
+        url = self.server.url + "/api"
+        self.server.route("/api", (500, "", 0))
+
+        client.get(url)
+        client.get(url)
+        self.assertEqual(breaker.state, "open")
+        with self.assertRaises(CircuitOpenError):
+            client.get(url)
+        self.assertEqual(self.server.hits["/api"], 2)       # skipped while open
+
+        time.sleep(0.25)
+        self.server.route("/api", (200, {}, 0))
+        self.assertEqual(client.get(url).status_code, 200)  # the half-open probe
+        self.assertEqual(breaker.state, "closed")
+
+    def test_failed_probe_reopens(self):
+        client = self.client = HttpClient(timeout_s=5, retries=0)
+        breaker = self.breaker("/api")
+        url = self.server.url + "/api"
+        self.server.route("/api", (500, "", 0))
+        client.get(url)
+        client.get(url)
+
+        time.sleep(0.25)
+        client.get(url)
+        self.assertEqual(breaker.state, "open")
+        with self.assertRaises(CircuitOpenError):
+            client.get(url)
+
+    def test_abandoned_probe_does_not_stick(self):
+        client = self.client = HttpClient(timeout_s=0.1, max_per_host=1, retries=0)
+        breaker = self.breaker("/api")
+        url = self.server.url + "/api"
+        self.server.route("/api", (500, "", 0))
+        client.get(url)
+        client.get(url)
+
+        # the probe cannot get a slot: it must give its turn back
+        time.sleep(0.25)
+        slots = client._host(url)[1]["slots"]
+        slots.acquire()
+        try:
+            with self.assertRaises(HostBusyError):
+                client.get(url)
+        finally:
+            slots.release()
+        self.assertEqual(breaker.state, "open")
+
+        time.sleep(0.25)
+        self.server.route("/api", (200, {}, 0))
+        self.assertEqual(client.get(url).status_code, 200)
+        self.assertEqual(breaker.state, "closed")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+# src/tests/test_plan_cache.py
+import unittest
+from src.diet_logic import SimpleINDBDiet
+from src.plan_cache import PlanCache
+
+class PlanCacheTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.planner = SimpleINDBDiet(store_dir=None)
+
+    def setUp(self):
+        self.cache = PlanCache()
+
+    def plan(self, weight, goal="Maintenance", seed=3):
+        return self.cache.plan(self.planner, 30, "m", weight, 178, (None, None), None, 38, 88,
+                               "Light(Walk)", goal, "Veg", "None", seed=seed)
+
+    def test_same_profile_hits(self):
+        first = self.plan(80.0)
+        self.assertEqual(self.plan(80.0), first)
+        self.assertEqual(self.cache.stats["hits"], 1)
+
+    def test_limits_are_the_callers_own(self):
+        # 80.00 and 80.04 kg get the same calorie target but not the same limits
+        for weight in [80.0, 80.04]:
+            with self.subTest(weight=weight):
+                plan = self.plan(weight)
+                direct = self.planner.plan(30, "m", weight, 178, (None, None), None, 38, 88,
+                                           "Light(Walk)", "Maintenance", "Veg", "None", seed=3)
+                self.assertEqual(plan["fat_range"], direct["fat_range"])
+                self.assertEqual(plan["constraints_met"], direct["constraints_met"])
+        self.assertEqual(self.cache.stats["hits"], 0)
+
+if __name__ == "__main__":
+    unittest.main()